@@ -0,0 +1,51 @@
+"""Взвешенный выбор за O(1) методом Уолкера (alias method).
+
+Таблица строится за O(n) по весам, после чего каждый выбор - одно случайное
+число и два обращения к массивам, независимо от числа элементов. Веса не
+меняются после построения: при изменении весов таблицу строят заново.
+"""
+from array import array
+
+
+class AliasTable:
+    """Выбор номера 0..n-1 с вероятностью, пропорциональной весу"""
+
+    __slots__ = ('size', 'prob', 'alias')
+
+    def __init__(self, weights):
+        size = len(weights)
+        total = float(sum(weights))
+        if size == 0 or total <= 0:
+            raise ValueError('нужен хотя бы один положительный вес')
+        self.size = size
+        self.prob = array('d', bytes(8 * size))
+        self.alias = array('I', bytes(4 * size))
+
+        # Алгоритм Возе: делим на "недостающие" и "избыточные" ячейки
+        scaled = [w * size / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large[-1]
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            if scaled[g] < 1.0:
+                large.pop()
+                small.append(g)
+        # Остатки равны 1 с точностью до округления
+        for i in large + small:
+            self.prob[i] = 1.0
+            self.alias[i] = i
+
+    def __len__(self):
+        return self.size
+
+    def sample(self, rng):
+        # Целая часть выбирает ячейку, дробная - саму ячейку или ее пару
+        u = rng.random() * self.size
+        i = int(u)
+        if i >= self.size:
+            i = self.size - 1
+        return i if u - i < self.prob[i] else self.alias[i]
@@ -0,0 +1,123 @@
+"""Журналирование по каналам и уровням без затрат в горячем пути.
+
+Каждый модуль берет свой канал: log = get_logger('sound'), и пишет
+log.debug('загружен %s за %.1f мс', name, ms) - формат и аргументы отдельно.
+Методы выключенных уровней - пустая функция: ни форматирования строки, ни
+ввода-вывода, только вызов. Включенные уровни ниже level не печатаются, а
+без форматирования кладутся в кольцевой буфер; буфер разворачивается в текст
+только при ошибке (log.error) и выводится вместе с ней - в консоль (на
+Android это logcat) и в файл dump_path, если он задан.
+
+Уровни настраиваются один раз через configure() (LearningApp.LOG_LEVEL и
+LOG_BUFFER_LEVEL), уже созданные каналы перенастраиваются.
+"""
+import threading
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100  # Уровень выше всех: ничего не писать/не копить
+
+LEVEL_NAMES = {DEBUG: 'D', INFO: 'I', WARNING: 'W', ERROR: 'E'}
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+
+
+class _Config:
+    level = WARNING        # С этого уровня записи печатаются сразу
+    buffer_level = INFO    # С этого уровня записи копятся в буфере
+    dump_path = None       # Куда дописывать буфер при ошибке
+
+
+_config = _Config()
+_buffer = deque(maxlen=256)  # (время, уровень, канал, формат, аргументы)
+_loggers = {}
+_lock = threading.Lock()
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _format(fmt, args):
+    if not args:
+        return fmt
+    try:
+        return fmt % args
+    except (TypeError, ValueError):
+        return f'{fmt} {args!r}'
+
+
+def _line(timestamp, level, channel, fmt, args):
+    clock = time.strftime('%H:%M:%S', time.localtime(timestamp))
+    return f'{clock} {LEVEL_NAMES.get(level, level)} [{channel}] {_format(fmt, args)}'
+
+
+def _dump(error_record):
+    """Разворачивает буфер при ошибке: непечатанные записи - в консоль, все - в файл"""
+    with _lock:
+        records = list(_buffer)
+        _buffer.clear()
+    lines = [_line(*record) for record in records]
+    for record, line in zip(records, lines):
+        if record[1] < _config.level:
+            print(line)
+    error_line = _line(*error_record)
+    print(error_line)
+    if _config.dump_path:
+        try:
+            with open(_config.dump_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines + [error_line, '', '']))
+        except (IOError, OSError):
+            pass
+
+
+class Logger:
+    """Канал журнала; методы уровней подменяются при configure()"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self._bind()
+
+    def _bind(self):
+        for name in ('debug', 'info', 'warning', 'error'):
+            setattr(self, name, self._method(LEVELS[name]))
+
+    def _method(self, level):
+        channel = self.channel
+        if level >= ERROR:
+            def error(fmt, *args):
+                _dump((time.time(), level, channel, fmt, args))
+            return error
+        if level >= _config.level:
+            def emit(fmt, *args):
+                record = (time.time(), level, channel, fmt, args)
+                _buffer.append(record)
+                print(_line(*record))
+            return emit
+        if level >= _config.buffer_level:
+            def remember(fmt, *args):
+                _buffer.append((time.time(), level, channel, fmt, args))
+            return remember
+        return _noop
+
+
+def get_logger(channel):
+    logger = _loggers.get(channel)
+    if logger is None:
+        logger = _loggers[channel] = Logger(channel)
+    return logger
+
+
+def configure(level=WARNING, buffer_level=INFO, buffer_size=256, dump_path=None):
+    """Задает уровни (числа или имена из LEVELS) и перенастраивает все каналы"""
+    global _buffer
+    _config.level = LEVELS.get(level, level)
+    _config.buffer_level = LEVELS.get(buffer_level, buffer_level)
+    _config.dump_path = dump_path
+    if buffer_size != _buffer.maxlen:
+        _buffer = deque(_buffer, maxlen=buffer_size)
+    for logger in _loggers.values():
+        logger._bind()
@@ -0,0 +1,106 @@
+"""Замер холодного старта: этапы загрузки и время импортов.
+
+Этапы отмечаются вызовом BOOT.mark(имя) по монотонным часам от импорта
+этого модуля (он импортируется первым): imports - модули приложения
+загружены, profile - профиль загружен, window - окно и контекст GL
+созданы, assets - атлас интерфейса загружен, build - дерево экрана
+построено, first_frame - первый тик главного цикла, interactive - экран
+полностью построен и готов к нажатию "Старт". Отметки почти ничего не стоят и пишутся всегда; при finish()
+сводка уходит в журнал, а если включена трассировка - этапы попадают в
+трассу как интервалы.
+
+С профилем импортов (MT_BOOT_PROFILE=1, см. profile_imports) каждый
+первый импорт модуля замеряется целиком, вместе с вложенными, а отчет
+сохраняется в boot.json - так видно, какие модули стоит импортировать
+позже.
+"""
+import builtins
+import json
+import os
+import sys
+from time import perf_counter_ns
+
+from applog import get_logger
+
+log = get_logger('boot')
+
+REPORT_IMPORTS = 40  # Сколько самых долгих импортов попадает в отчет
+
+
+class BootProfiler:
+    """Отметки этапов старта и (по запросу) время импортов"""
+
+    def __init__(self):
+        self.origin = perf_counter_ns()
+        self.marks = []     # (этап, нс от origin)
+        self.imports = []   # (модуль, вложенность, нс с вложенными импортами)
+        self.finished = False
+        self._original_import = None
+        self._depth = 0
+
+    def mark(self, name):
+        self.marks.append((name, perf_counter_ns() - self.origin))
+
+    # --- Импорты --- #
+
+    def profile_imports(self):
+        """Замеряет все последующие первые импорты до finish()"""
+        if self._original_import is not None:
+            return
+        original = self._original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            depth = self._depth
+            self._depth += 1
+            start = perf_counter_ns()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                self._depth = depth
+                self.imports.append((name, depth, perf_counter_ns() - start))
+
+        builtins.__import__ = timed_import
+
+    def stop_imports(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    # --- Отчет --- #
+
+    def report(self):
+        slowest = sorted(self.imports, key=lambda item: item[2], reverse=True)[:REPORT_IMPORTS]
+        return {
+            'marks_ms': {name: ns / 1e6 for name, ns in self.marks},
+            'imports_ms': [{'module': name, 'depth': depth, 'ms': ns / 1e6} for name, depth, ns in slowest],
+        }
+
+    def finish(self, tracer=None, report_path=None):
+        """Конец старта: сводка в журнал, этапы - в трассу, отчет - в report_path"""
+        if self.finished:
+            return
+        self.finished = True
+        profiled = self._original_import is not None
+        self.stop_imports()
+        log.info('Старт: %s', ', '.join(f'{name} {ns / 1e6:.0f} мс' for name, ns in self.marks))
+        if tracer is not None and tracer.enabled:
+            previous = self.origin
+            for name, ns in self.marks:
+                tracer.record(f'boot.{name}', previous, self.origin + ns)
+                previous = self.origin + ns
+        if profiled and report_path:
+            try:
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.report(), f, indent=2, ensure_ascii=False)
+            except (IOError, OSError) as e:
+                log.error('Ошибка записи отчета о старте: %s', e)
+                return
+            log.info('Отчет о старте: %s', report_path)
+
+
+BOOT = BootProfiler()
+
+if os.environ.get('MT_BOOT_PROFILE') == '1':
+    BOOT.profile_imports()
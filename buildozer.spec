@@ -3,7 +3,10 @@ title = Изучение таблицы умножения
 package.name = multiplicationlearning
 package.domain = org.example
 source.dir = .
-source.include_exts = py,png,jpg,kv,atlas,json,wav
+source.include_exts = py,png,jpg,kv,atlas,json,bank
+source.exclude_dirs = tools
+# Исходники атласа ui.atlas (собирается tools/pack_atlas.py)
+source.exclude_patterns = star_*.png
 version = 2.3
 requirements = python3,kivy,pyjnius==1.6.1
 icon.filename = %(source.dir)s/icon.png
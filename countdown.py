@@ -0,0 +1,91 @@
+"""Обратный отсчет времени на ответ по дедлайну.
+
+Время считается от момента показа вопроса по монотонным часам высокого
+разрешения (perf_counter), а не числом тиков таймера: ошибка тиков не
+накапливается, а время ответа известно с точностью до миллисекунд.
+Countdown - надпись "Время: N" с полосой оставшегося времени под текстом;
+проверка идет каждый кадр, но текст и полоса меняются, только когда
+меняется видимое значение (целая секунда или ширина полосы в пикселях).
+Все строки отсчета (text_keys) экран закрепляет в кэше текстур, поэтому
+смена секунды берет готовую текстуру и не рисует текст заново.
+"""
+import math
+import time
+
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+
+from text_cache import CachedLabel
+
+BAR_COLOR = (0.2, 0.64, 0.81, 0.35)
+TEMPLATE = 'Время: {}'
+
+
+class Countdown(CachedLabel):
+    """Надпись с отсчетом до дедлайна; on_expire вызывается при его наступлении"""
+
+    def __init__(self, cache, on_expire, clock=time.perf_counter, **kwargs):
+        super().__init__(cache, **kwargs)
+        self.on_expire = on_expire
+        self.clock = clock
+        self.started = None
+        self.duration = 0
+        self.deadline = None
+        self.shown_seconds = None
+        self.bar_width = None
+        with self.canvas.before:
+            Color(rgba=BAR_COLOR)
+            self._bar = Rectangle(size=(0, 0))
+        self.fbind('pos', self._redraw)
+        self.fbind('size', self._redraw)
+        self._frame_event = Clock.create_trigger(self._on_frame, 0, interval=True)
+
+    def start(self, duration):
+        self.started = self.clock()
+        self.duration = duration
+        self.deadline = self.started + duration
+        self.show(duration)
+        self._frame_event()
+
+    def stop(self):
+        self._frame_event.cancel()
+        self.deadline = None
+
+    def text_keys(self, duration):
+        """Ключи кэша всех строк отсчета от duration до 0 (для закрепления)"""
+        return [self.text_key(TEMPLATE.format(seconds)) for seconds in range(duration, -1, -1)]
+
+    def elapsed(self):
+        """Секунд с начала отсчета (не больше его длительности)"""
+        if self.started is None:
+            return 0.0
+        return min(self.clock() - self.started, self.duration)
+
+    def remaining(self):
+        return max(0.0, self.deadline - self.clock()) if self.deadline is not None else 0.0
+
+    def _on_frame(self, dt):
+        if self.deadline is None:
+            self._frame_event.cancel()
+            return
+        remaining = self.deadline - self.clock()
+        self.show(max(0.0, remaining))
+        if remaining <= 0:
+            self.stop()
+            self.on_expire()
+
+    def show(self, remaining):
+        """Показывает оставшееся время; меняет только то, что видно иначе"""
+        seconds = math.ceil(remaining)
+        if seconds != self.shown_seconds:
+            self.shown_seconds = seconds
+            self.text = TEMPLATE.format(seconds)
+        width = int(self.width * remaining / self.duration) if self.duration else 0
+        if width != self.bar_width:
+            self.bar_width = width
+            self._bar.size = (width, self.height)
+
+    def _redraw(self, *args):
+        self._bar.pos = self.pos
+        self.bar_width = None
+        self.show(self.remaining() if self.deadline is not None else self.duration)
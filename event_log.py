@@ -0,0 +1,241 @@
+"""Журнал ответов: только дозапись, сегменты и сжатие по снимкам.
+
+Каждое событие - запись с префиксом длины и контрольной суммой:
+
+    <длина тела: uint32> <тело> <crc32 тела: uint32>
+
+Тело начинается с байта типа. ANSWER хранит пример, ответ, правильность,
+время ответа, этап и метку времени; STATE - полный снимок TrainerEngine в JSON
+(пишется при переходах между этапами и в начале каждого сегмента).
+
+Журнал разбит на сегменты events-<поколение>.log. Снимок прогресса хранит
+позицию (поколение, смещение), до которой он учитывает события, поэтому при
+запуске воспроизводится только хвост после снимка. Сегмент, набравший
+segment_events событий, закрывается; старые сегменты удаляются, когда
+сохраненный снимок их уже не требует и их больше keep_segments. Так время
+запуска и место на диске ограничены при любой длительности использования.
+"""
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from applog import get_logger
+
+MAGIC = b'MTEL'
+VERSION = 1
+HEADER = struct.Struct('<4sBI')   # magic, версия, поколение
+LENGTH = struct.Struct('<I')
+CRC = struct.Struct('<I')
+
+EVENT_ANSWER = 1
+EVENT_STATE = 2
+
+ANSWER = struct.Struct('<BdIiBfB')  # тип, время, пример, ответ, флаги, секунды на ответ, этап
+STATE_PREFIX = struct.Struct('<Bd')  # тип, время; дальше JSON
+
+FLAG_CORRECT = 1
+FLAG_TIMED_OUT = 2
+
+NO_ANSWER = -1  # Ответ при тайм-ауте
+
+AnswerEvent = namedtuple('AnswerEvent', 'timestamp fact answer is_correct timed_out latency stage')
+StateEvent = namedtuple('StateEvent', 'timestamp state')
+
+SEGMENT_RE = re.compile(r'^events-(\d{6})\.log$')
+
+log = get_logger('event_log')
+
+
+class EventLog:
+    """Сегментированный журнал событий в каталоге directory"""
+
+    def __init__(self, directory, segment_events=4096, keep_segments=8):
+        self.directory = directory
+        self.segment_events = segment_events
+        self.keep_segments = keep_segments  # Сколько старых сегментов хранить как историю
+        self.generation = 0
+        self.segment_count = 0
+        self._file = None
+
+    # --- Файлы сегментов --- #
+
+    def segment_path(self, generation):
+        return os.path.join(self.directory, f'events-{generation:06d}.log')
+
+    def generations(self):
+        """Поколения существующих сегментов по возрастанию"""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_RE.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        found.sort()
+        return found
+
+    def _read_segment(self, generation, offset=None):
+        """Перебирает (событие, смещение после него) в сегменте.
+
+        Останавливается на первой неполной или поврежденной записи.
+        """
+        try:
+            with open(self.segment_path(generation), 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return
+        if len(data) < HEADER.size:
+            return
+        magic, version, file_generation = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or file_generation != generation:
+            return
+        pos = HEADER.size if offset is None or offset < HEADER.size else offset
+        end = len(data)
+        while pos + LENGTH.size <= end:
+            (length,) = LENGTH.unpack_from(data, pos)
+            body_start = pos + LENGTH.size
+            body_end = body_start + length
+            if length == 0 or body_end + CRC.size > end:
+                return
+            body = data[body_start:body_end]
+            (crc,) = CRC.unpack_from(data, body_end)
+            if zlib.crc32(body) != crc:
+                return
+            event = self._decode(body)
+            pos = body_end + CRC.size
+            if event is not None:
+                yield event, pos
+
+    def _decode(self, body):
+        kind = body[0]
+        if kind == EVENT_ANSWER and len(body) == ANSWER.size:
+            _, ts, fact, answer, flags, latency, stage = ANSWER.unpack(body)
+            return AnswerEvent(ts, fact, answer, bool(flags & FLAG_CORRECT),
+                               bool(flags & FLAG_TIMED_OUT), latency, stage)
+        if kind == EVENT_STATE and len(body) > STATE_PREFIX.size:
+            _, ts = STATE_PREFIX.unpack_from(body, 0)
+            try:
+                state = json.loads(body[STATE_PREFIX.size:].decode('utf-8'))
+            except ValueError:
+                return None
+            return StateEvent(ts, state)
+        return None
+
+    # --- Чтение --- #
+
+    def replay(self, position=None):
+        """События после позиции снимка (поколение, смещение).
+
+        Без позиции воспроизводится последний сегмент целиком: он начинается
+        со снимка состояния, поэтому самодостаточен.
+        """
+        generations = self.generations()
+        if not generations:
+            return
+        if position is None:
+            start_generation, offset = generations[-1], None
+        else:
+            start_generation, offset = position
+            if start_generation not in generations:
+                # Сегмента снимка уже нет - начинаем с первого более нового
+                offset = None
+        for generation in generations:
+            if generation < start_generation:
+                continue
+            for event, _ in self._read_segment(generation, offset if generation == start_generation else None):
+                yield event
+
+    # --- Запись --- #
+
+    def open(self, state):
+        """Открывает последний сегмент на дозапись (или создает первый)"""
+        os.makedirs(self.directory, exist_ok=True)
+        generations = self.generations()
+        if not generations:
+            self._start_segment(1, state)
+            return
+        self.generation = generations[-1]
+        valid_end = HEADER.size
+        count = 0
+        for _, pos in self._read_segment(self.generation):
+            valid_end = pos
+            count += 1
+        path = self.segment_path(self.generation)
+        if count == 0:
+            # Пустой или испорченный сегмент - начинаем его заново
+            self._start_segment(self.generation, state)
+            return
+        self._file = open(path, 'r+b')
+        # Отрезаем оборванную последнюю запись, если приложение упало во время записи
+        self._file.truncate(valid_end)
+        self._file.seek(valid_end)
+        self.segment_count = count
+
+    def _start_segment(self, generation, state):
+        if self._file is not None:
+            self._file.close()
+        self.generation = generation
+        self.segment_count = 0
+        self._file = open(self.segment_path(generation), 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, generation))
+        self.append_state(state)
+
+    def position(self):
+        """Текущая позиция конца журнала для снимка прогресса"""
+        return [self.generation, self._file.tell() if self._file is not None else HEADER.size]
+
+    def _append(self, body):
+        if self._file is None:
+            return
+        self._file.write(LENGTH.pack(len(body)) + body + CRC.pack(zlib.crc32(body)))
+        # Без fsync: запись переживает падение приложения, fsync делается в sync()
+        self._file.flush()
+        self.segment_count += 1
+
+    def append_answer(self, fact, answer, is_correct, timed_out, latency, stage, timestamp=None):
+        flags = (FLAG_CORRECT if is_correct else 0) | (FLAG_TIMED_OUT if timed_out else 0)
+        if answer is None:
+            answer = NO_ANSWER
+        self._append(ANSWER.pack(EVENT_ANSWER, timestamp if timestamp is not None else time.time(),
+                                 fact, answer, flags, latency, stage))
+
+    def append_state(self, state, timestamp=None):
+        payload = json.dumps(state, separators=(',', ':')).encode('utf-8')
+        self._append(STATE_PREFIX.pack(EVENT_STATE, timestamp if timestamp is not None else time.time()) + payload)
+
+    def needs_rollover(self):
+        return self.segment_count >= self.segment_events
+
+    def rollover(self, state):
+        """Закрывает текущий сегмент и начинает новый со снимка state"""
+        self.sync()
+        self._start_segment(self.generation + 1, state)
+
+    def compact(self, durable_position):
+        """Удаляет сегменты, не нужные сохраненному снимку и вышедшие за keep_segments"""
+        if not durable_position:
+            return
+        durable_generation = durable_position[0]
+        limit = min(durable_generation, self.generation - self.keep_segments)
+        for generation in self.generations():
+            if generation < limit:
+                try:
+                    os.remove(self.segment_path(generation))
+                except OSError as e:
+                    log.warning('Не удалось удалить сегмент журнала: %s', e)
+
+    def sync(self):
+        """Сбрасывает журнал на диск"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,94 @@
+"""Ленивый индекс примеров набора таблиц.
+
+Примеры упорядочены по таблицам, внутри таблицы - по множителю и виду
+примера, поэтому "все примеры до таблицы N" - это префикс [0, end(N)).
+Пример обозначается номером в индексе; операнды, ответ и текст вопроса
+вычисляются по номеру на лету, поэтому индекс не хранит примеров и не
+зависит по памяти и времени создания от размера набора.
+"""
+from problems import PROBLEM_SPACES, get_kind
+
+
+class FactIndex:
+    """Индекс примеров для таблиц tables с множителями factors (оба - range)"""
+
+    def __init__(self, tables=range(2, 10), factors=range(1, 10), kinds=('mul', 'div'), name='classic'):
+        if not tables or not factors or not kinds:
+            raise ValueError('пустой набор примеров')
+        self.name = name
+        self.tables = tables
+        self.factors = factors
+        self.kinds = tuple(get_kind(kind) for kind in kinds)
+        self.first_table = tables[0]
+        self.last_table = tables[-1]
+        self.per_table = len(factors) * len(self.kinds)
+
+    def __len__(self):
+        return len(self.tables) * self.per_table
+
+    def decode(self, fact):
+        """(вид, таблица, множитель) примера"""
+        t, local = divmod(fact, self.per_table)
+        f, k = divmod(local, len(self.kinds))
+        return self.kinds[k], self.tables[t], self.factors[f]
+
+    def operands(self, fact):
+        kind, table, factor = self.decode(fact)
+        return kind.operands(table, factor)
+
+    def answer(self, fact):
+        kind, table, factor = self.decode(fact)
+        return kind.answer(*kind.operands(table, factor))
+
+    def question(self, fact):
+        """Текст вопроса для экрана"""
+        kind, table, factor = self.decode(fact)
+        return kind.question(*kind.operands(table, factor))
+
+    def table_range(self, table_num):
+        """Номера примеров таблицы: (начало, конец)"""
+        start = self.tables.index(table_num) * self.per_table
+        return start, start + self.per_table
+
+    def prefix_end(self, table_num):
+        """Число примеров во всех таблицах от первой до table_num включительно"""
+        return (self.tables.index(table_num) + 1) * self.per_table
+
+    def next_table(self, table_num):
+        """Следующая таблица или None после последней"""
+        i = self.tables.index(table_num) + 1
+        return self.tables[i] if i < len(self.tables) else None
+
+    # --- Тексты для экрана --- #
+
+    @property
+    def subject(self):
+        """Чего таблицы: "умножения и деления" """
+        return ' и '.join(dict.fromkeys(kind.subject for kind in self.kinds))
+
+    def table_title(self, table_num):
+        """Название таблицы: "Таблица на 7", у квадратов - "Квадраты 11–20" """
+        first, last = self._numbers(table_num)
+        return self.kinds[0].table_template.format(table=table_num, first=first, last=last)
+
+    def range_text(self):
+        """Диапазон всего набора: "от 2 до 9" """
+        return f'от {self._numbers(self.first_table)[0]} до {self._numbers(self.last_table)[1]}'
+
+    def _numbers(self, table_num):
+        # Первый операнд первого и последнего примера таблицы (у умножения - сама таблица)
+        kind = self.kinds[0]
+        return kind.operands(table_num, self.factors[0])[0], kind.operands(table_num, self.factors[-1])[0]
+
+
+def space_index(name):
+    """Индекс для набора таблиц из PROBLEM_SPACES"""
+    try:
+        space = PROBLEM_SPACES[name]
+    except KeyError:
+        raise ValueError(f'Неизвестный набор таблиц: {name}') from None
+    return FactIndex(name=name, **space)
+
+
+# Общий индекс для таблиц 2-9
+FACT_INDEX = space_index('classic')
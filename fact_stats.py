@@ -0,0 +1,101 @@
+"""Компактная статистика по примерам.
+
+Для каждого примера (номер в FactIndex) хранятся попытки, ошибки, тайм-ауты,
+среднее и разброс времени ответа (алгоритм Уэлфорда), сглаженное время
+ответа и время последнего показа. Все поля - плоские массивы фиксированного
+размера, поэтому память не растет с числом ответов, а учет ответа ничего не
+создает. Массивы растут только до последнего спрошенного примера (grow), так
+что большие наборы таблиц не занимают память под примеры, которых не было.
+"""
+import base64
+import time
+from array import array
+
+EWMA_ALPHA = 0.3  # Вес последнего ответа в сглаженном времени ответа
+
+FIELDS = (
+    ('attempts', 'I'),
+    ('errors', 'I'),        # Неверные ответы и тайм-ауты
+    ('timeouts', 'I'),
+    ('latency_mean', 'd'),
+    ('latency_m2', 'd'),    # Сумма квадратов отклонений для дисперсии
+    ('latency_ewma', 'd'),
+    ('last_seen', 'd'),     # Unix-время последнего ответа
+)
+
+
+class FactStats:
+    """Статистика по size примерам в виде массивов по полям"""
+
+    __slots__ = ('size',) + tuple(name for name, _ in FIELDS)
+
+    def __init__(self, size=0):
+        self.size = size
+        for name, code in FIELDS:
+            setattr(self, name, array(code, bytes(array(code).itemsize * size)))
+
+    def grow(self, size):
+        """Расширяет массивы нулями до size примеров"""
+        if size <= self.size:
+            return
+        for name, code in FIELDS:
+            getattr(self, name).frombytes(bytes(array(code).itemsize * (size - self.size)))
+        self.size = size
+
+    def record(self, fact, is_correct, timed_out, latency, timestamp=None):
+        """Учитывает ответ на пример"""
+        if fact >= self.size:
+            self.grow(fact + 1)
+        n = self.attempts[fact] + 1
+        self.attempts[fact] = n
+        if not is_correct:
+            self.errors[fact] += 1
+            if timed_out:
+                self.timeouts[fact] += 1
+        # Онлайн-среднее и дисперсия (Уэлфорд)
+        mean = self.latency_mean[fact]
+        delta = latency - mean
+        mean += delta / n
+        self.latency_mean[fact] = mean
+        self.latency_m2[fact] += delta * (latency - mean)
+        if n == 1:
+            self.latency_ewma[fact] = latency
+        else:
+            self.latency_ewma[fact] += EWMA_ALPHA * (latency - self.latency_ewma[fact])
+        self.last_seen[fact] = timestamp if timestamp is not None else time.time()
+
+    def row(self, fact):
+        """Значения всех полей примера в порядке FIELDS"""
+        return tuple(getattr(self, name)[fact] for name, _ in FIELDS)
+
+    def set_row(self, fact, values):
+        if fact >= self.size:
+            self.grow(fact + 1)
+        for (name, _), value in zip(FIELDS, values):
+            getattr(self, name)[fact] = value
+
+    def error_rate(self, fact):
+        attempts = self.attempts[fact]
+        return self.errors[fact] / attempts if attempts else 0.0
+
+    def snapshot(self):
+        """Поля в виде base64 сырых массивов (компактно для JSON)"""
+        data = {'size': self.size}
+        for name, _ in FIELDS:
+            data[name] = base64.b64encode(getattr(self, name).tobytes()).decode('ascii')
+        return data
+
+    def restore(self, data):
+        """Восстанавливает из snapshot(); поля не того размера игнорируются"""
+        if not data:
+            return
+        size = data.get('size', 0)
+        self.grow(size)
+        for name, code in FIELDS:
+            raw = data.get(name)
+            if raw is None:
+                continue
+            values = array(code)
+            values.frombytes(base64.b64decode(raw))
+            if len(values) == size:
+                getattr(self, name)[:size] = values
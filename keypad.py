@@ -0,0 +1,102 @@
+"""Цифровая клавиатура экрана одним виджетом.
+
+Все 12 клавиш рисуются инструкциями canvas (прямоугольник клавиши и
+текстура надписи из TextTextureCache), касания проверяются самим виджетом
+по сетке - без 12 кнопок, их привязок, надписей и раскладки. Нажатие
+передается в on_key(клавиша) сразу при касании: '0'..'9', 'clear' или
+'check'.
+"""
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import sp
+from kivy.uix.widget import Widget
+
+COLUMNS = 3
+ROWS = 4
+KEYS = ('1', '2', '3', '4', '5', '6', '7', '8', '9', 'clear', '0', 'check')
+KEY_LABELS = {'clear': 'Очистить', 'check': 'Проверить'}
+# Цвета как у прежних кнопок (серый фон кнопки Kivy с тонировкой background_color)
+KEY_COLORS = {'clear': (0, 0, 0.35, 1), 'check': (0, 0.35, 0, 1)}
+DIGIT_COLOR = (0.35, 0.35, 0.35, 1)
+PRESSED_COLOR = (0.2, 0.64, 0.81, 1)
+DISABLED_ALPHA = 0.5
+
+
+class Keypad(Widget):
+    """Сетка 3x4 клавиш, нарисованная на canvas"""
+
+    def __init__(self, cache, on_key, spacing=5, **kwargs):
+        super().__init__(**kwargs)
+        self.on_key = on_key
+        self.spacing = spacing
+        self.pressed = None  # Индекс нажатой клавиши (подсветка до отпускания)
+        self.key_colors = []
+        self.key_rects = []
+        self.label_rects = []
+        with self.canvas:
+            for key in KEYS:
+                self.key_colors.append(Color(rgba=KEY_COLORS.get(key, DIGIT_COLOR)))
+                self.key_rects.append(Rectangle())
+            self.label_color = Color(1, 1, 1, 1)
+            for key in KEYS:
+                font_size = sp(18) if key in KEY_LABELS else sp(24)
+                texture = cache.get(KEY_LABELS.get(key, key), font_size)
+                self.label_rects.append(Rectangle(texture=texture, size=texture.size if texture else (0, 0)))
+        self.fbind('pos', self._layout)
+        self.fbind('size', self._layout)
+        self.fbind('disabled', self._update_colors)
+        self._layout()
+
+    def key_size(self):
+        return ((self.width - (COLUMNS - 1) * self.spacing) / COLUMNS,
+                (self.height - (ROWS - 1) * self.spacing) / ROWS)
+
+    def _layout(self, *args):
+        width, height = self.key_size()
+        for i, (rect, label) in enumerate(zip(self.key_rects, self.label_rects)):
+            row, column = divmod(i, COLUMNS)
+            x = self.x + column * (width + self.spacing)
+            y = self.top - (row + 1) * height - row * self.spacing
+            rect.pos = (x, y)
+            rect.size = (width, height)
+            label_width, label_height = label.size
+            label.pos = (int(x + (width - label_width) / 2), int(y + (height - label_height) / 2))
+
+    def _update_colors(self, *args):
+        alpha = DISABLED_ALPHA if self.disabled else 1
+        for i, (key, color) in enumerate(zip(KEYS, self.key_colors)):
+            r, g, b, _ = PRESSED_COLOR if i == self.pressed else KEY_COLORS.get(key, DIGIT_COLOR)
+            color.rgba = (r, g, b, alpha)
+        self.label_color.a = alpha
+
+    def key_at(self, x, y):
+        """Индекс клавиши под точкой или None (вне виджета или в зазоре между клавишами)"""
+        if not self.collide_point(x, y):
+            return None
+        width, height = self.key_size()
+        column = min(COLUMNS - 1, int((x - self.x) / (width + self.spacing)))
+        row = min(ROWS - 1, int((self.top - y) / (height + self.spacing)))
+        if x - self.x - column * (width + self.spacing) > width:
+            return None
+        if self.top - y - row * (height + self.spacing) > height:
+            return None
+        return row * COLUMNS + column
+
+    def on_touch_down(self, touch):
+        if self.disabled or not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        i = self.key_at(*touch.pos)
+        if i is None:
+            return True
+        touch.grab(self)
+        self.pressed = i
+        self._update_colors()
+        self.on_key(KEYS[i])
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        self.pressed = None
+        self._update_colors()
+        return True
@@ -1,113 +1,166 @@
+from boot_profile import BOOT  # Первым: от него отсчитывается время старта
+
 import kivy
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.textinput import TextInput
-from kivy.uix.popup import Popup
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.clock import Clock
 import random
-from functools import partial
-import json
 import os
-from kivy.uix.slider import Slider
-from kivy.core.audio import SoundLoader
-from kivy.uix.progressbar import ProgressBar
-from kivy.uix.image import Image
-from kivy.uix.widget import Widget
+import time
 from kivy.metrics import dp
 
+from trainer_engine import TrainerEngine, MASTERY_COMPLETE, TRIGGER_STREAK, TRIGGER_HALF
+from fact_index import space_index
+from progress_store import load_progress
+from profile_store import ProfileStore, WriterUnavailable
+from event_log import EventLog, StateEvent
+from sound_manager import SoundManager
+from sound_bank import SoundBank, SoundBankPlayer
+from popups import PopupManager
+from text_cache import TextTextureCache, CachedLabel
+from countdown import Countdown
+from keypad import Keypad
+from ui_assets import UI_ASSETS
+from tracing import TRACER
+from perf_hud import PerfHud
+from stall_watchdog import Watchdog
+from session_recorder import SessionRecorder, prune_recordings
+import applog
+
 kivy.require('2.0.0')
 
-# Словарь с последовательностями для каждой таблицы
-LEARNING_SEQUENCES = {}
-for n in range(2, 10):
-    sequence = []
-    for i in range(1, 10):
-        # Добавляем пример на умножение
-        sequence.append((n, i, '*'))
-        # Добавляем пример на деление
-        sequence.append((n * i, n, '/'))
-    LEARNING_SEQUENCES[n] = sequence
+log = applog.get_logger('app')
+
+BOOT.mark('imports')
+
+SOUND_BANK_FILE = 'sounds.bank'  # Собирается tools/pack_sounds.py
+
+MAX_STARS = 18  # Максимум звездочек в ряду прогресса (2 строки по 9)
+
+ANSWER_HINT = 'Ваш ответ'
+ANSWER_COLOR = (0, 0, 0, 1)
+ANSWER_HINT_COLOR = (0.5, 0.5, 0.5, 1)
+MAX_ANSWER_DIGITS = 6
+
+# Мотивационные сообщения за серию правильных ответов
+STREAK_MESSAGES = [
+    "Отлично! 25 правильных ответов подряд!",
+    "Великолепно! Ты в ударе!",
+    "Потрясающе! Продолжай в том же духе!",
+    "Браво! Ты настоящий математик!"
+]
 
 
 class LearningScreen(Screen):
-    """Экран пошагового изучения выбранной таблицы"""
+    """Экран пошагового изучения выбранной таблицы.
+
+    Вся логика сессии находится в TrainerEngine, экран только отображает
+    его состояние, управляет таймером и звуками.
+    """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.mastery_examples = []
-        self.current_example = None
-        self.time_limit = App.get_running_app().time_limit
-        self.remaining_time = self.time_limit
-        self.timer_event = None
-        self.session_active = False
-        self.click_sound = SoundLoader.load('click.wav')
-        # Загружаем звуки ошибок
-        self.fail_sounds = []
-        for i in range(1, 6):
-            sound = SoundLoader.load(f'fail{i}.wav')
-            if sound:
-                self.fail_sounds.append(sound)
+        self.engine = App.get_running_app().engine
+        # Отложенные вызовы создаются один раз и переиспользуются: повторный
+        # запуск не плодит событий Clock, а stop_session отменяет их все
+        self.next_question_event = Clock.create_trigger(self.on_question_due, 1.0)
+        self.restore_timer_event = Clock.create_trigger(lambda dt: self.show_timer(), 1.0)
+        self.deferred_ui_event = Clock.create_trigger(self.build_deferred_ui, 0)
+        # Звуки только регистрируем, загрузка идет в фоне после первого кадра
+        self.sounds = self.create_sound_player()
         
-        # Загружаем мотивационные звуки
-        self.good_sounds = []
-        for i in range(1, 6):
-            sound = SoundLoader.load(f'good{i}.wav')
-            if sound:
-                self.good_sounds.append(sound)
+        self.popups = PopupManager()
+        # Текстуры вопроса, таймера и обратной связи - из кэша, без растеризации в кадре ответа
+        self.text_cache = TextTextureCache()
         
-        # Счетчики для мотивационных триггеров
-        self.correct_streak = 0  # Серия правильных ответов подряд
-        self.fast_answers = 0    # Количество быстрых ответов подряд
-        self.session_correct = 0 # Правильных ответов в текущей сессии
-        self.current_score = App.get_running_app().current_score
-        self.target_score = 150 # Target score for stage 2
-        self.current_stage = App.get_running_app().current_stage # 1 = mastery stage, 2 = score stage
+        self.answer_started = None  # Начало интервала "ответ -> следующий вопрос"
+        self.answer_text = ''         # Набранный ответ
+        self.answer_pending = False   # Вопрос на экране, ответа еще не было
+        # При воспроизведении записи таймер и отложенный вопрос не срабатывают сами -
+        # тайм-ауты и показ вопросов приходят из записи (см. session_recorder)
+        self.replaying = False
+
         self.build_ui()
+        if TRACER.enabled:
+            self.add_widget(PerfHud(TRACER))
+        Clock.schedule_once(self.preload_sounds, 0.5)
+        # Диалоги строим заранее в свободное время, чтобы не тормозить во время вопроса
+        Clock.schedule_once(self.popups.prebuild, 1.0)
+
+    def create_sound_player(self):
+        """Звуки из банка sounds.bank, а если его нет - из отдельных wav-файлов"""
+        if os.path.exists(SOUND_BANK_FILE):
+            try:
+                cache_dir = os.path.join(App.get_running_app().user_data_dir, 'sound_cache')
+                return SoundBankPlayer(SoundBank(SOUND_BANK_FILE), cache_dir)
+            except (IOError, OSError, ValueError) as e:
+                log.error('Ошибка чтения звукового банка: %s', e)
+
+        sounds = SoundManager(max_loaded=6)
+        sounds.register('click', 'click.wav', pinned=True)
+        for i in range(1, 6):
+            # Звуки ошибок
+            sounds.register(f'fail{i}', f'fail{i}.wav', group='fail')
+            # Мотивационные звуки
+            sounds.register(f'good{i}', f'good{i}.wav', group='good')
+        return sounds
+
+    def preload_sounds(self, dt):
+        """Фоновая загрузка звуков, нужных с первого вопроса"""
+        self.sounds.preload(['click', 'fail4', 'good5', 'fail1', 'fail3', 'fail5'])
+
+    @property
+    def session_active(self):
+        return self.engine.session_active
+
+    @property
+    def current_fact(self):
+        return self.engine.current_fact
+
+    @property
+    def current_stage(self):
+        return self.engine.current_stage
+
+    @property
+    def current_score(self):
+        return self.engine.current_score
+
+    @property
+    def target_score(self):
+        return self.engine.target_score
+
+    @property
+    def time_limit(self):
+        return self.engine.time_limit
 
     def build_ui(self):
+        """Стартовый вид: кнопки сессии, заголовок, надпись и нижние кнопки.
+
+        Скрытые до "Старт" части (прогресс со звездами, поле ответа и
+        клавиатура) строятся позже в свободных кадрах (build_deferred_ui) на
+        заранее отведенных местах, чтобы макет не сдвигался. Без быстрого
+        старта (LearningApp.FAST_START) они строятся сразу.
+        """
         # Основной макет. Используем dp для консистентности.
         # Добавляем отступ сверху dp(30), чтобы избежать наложения на статус бар.
         self.layout = BoxLayout(orientation='vertical', padding=[dp(10), dp(30), dp(10), dp(10)], spacing=dp(10))
 
-        # Блок с прогресс-барами. Уменьшаем его высоту и внутренние отступы.
+        # Место под прогресс-бары и звезды (наполняет build_progress_view)
         self.progress_bars_layout = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(120), spacing=dp(5))
-        
-        # Убираем дублирующую надпись, так как 'points_big_label' показывает ту же информацию.
-        # self.points_progress_label = Label(text=f'Серия: {self.current_score}/{self.target_score}', size_hint_y=None, height='30dp', halign='left', valign='middle')
-        
-        # Уменьшаем высоту прогресс-бара
-        self.points_progress_bar = ProgressBar(max=self.target_score, value=self.current_score, size_hint_y=None, height=dp(20))
-        
-        # Уменьшаем высоту и размер шрифта для крупной надписи с очками
-        self.points_big_label = Label(text=f'Набрано {self.current_score} из {self.target_score}', 
-                                     size_hint_y=None, height=dp(40), font_size='22sp', 
-                                     halign='center', valign='middle', bold=True)
-        
-        # self.progress_bars_layout.add_widget(self.points_progress_label) # Убрали
-        self.progress_bars_layout.add_widget(self.points_progress_bar)
-        self.progress_bars_layout.add_widget(self.points_big_label)
-
-        # Прогресс изучения со звездами. Делаем компактнее.
-        self.mastery_progress_label = Label(text='Прогресс изучения: 0/0', size_hint_y=None, height=dp(20), halign='left', valign='middle')
-        # Уменьшаем высоту блока со звездами, чтобы они были в один ряд.
-        self.mastery_stars_layout = GridLayout(cols=9, size_hint_y=None, height=dp(30), spacing=dp(3))
-        self.progress_bars_layout.add_widget(self.mastery_progress_label)
-        self.progress_bars_layout.add_widget(self.mastery_stars_layout)
-
         self.layout.add_widget(self.progress_bars_layout)
 
         # Уменьшаем кнопки Старт/Стоп
         session_controls = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(45), spacing=dp(10))
         self.start_button = Button(text='Старт', background_color=(0, 1, 0, 1))
-        self.start_button.bind(on_press=self.start_session)
+        self.start_button.bind(on_press=lambda instance: self.handle_input('start'))
         session_controls.add_widget(self.start_button)
 
         self.stop_button = Button(text='Стоп', background_color=(1, 0, 0, 1), disabled=True)
-        self.stop_button.bind(on_press=self.stop_session)
+        self.stop_button.bind(on_press=lambda instance: self.handle_input('stop'))
         session_controls.add_widget(self.stop_button)
         self.layout.add_widget(session_controls)
 
@@ -116,54 +169,33 @@ class LearningScreen(Screen):
         self.layout.add_widget(self.title_label)
 
         # Уменьшаем блок вопроса и шрифт
-        self.question_label = Label(text='', font_size='40sp', size_hint_y=None, height=dp(90))
+        self.question_label = CachedLabel(self.text_cache, text='', font_size='40sp', size_hint_y=None, height=dp(90))
         self.layout.add_widget(self.question_label)
 
-        # Уменьшаем поле ввода ответа
-        self.answer_input = TextInput(hint_text='Ваш ответ', font_size='28sp', multiline=False,
-                                       input_filter='int', size_hint_y=None, height=dp(60),
-                                       halign='center', readonly=True)
-        self.answer_input.bind(on_text_validate=self.check_answer)
-        self.layout.add_widget(self.answer_input)
-
-        # Уменьшаем клавиатуру и отступы между кнопками
-        self.keyboard_layout = GridLayout(cols=3, spacing=dp(5), size_hint_y=None, height=dp(220))
-        
-        # Кнопки цифр 1-9
-        for i in range(1, 10):
-            btn = Button(text=str(i), font_size='24sp')
-            btn.bind(on_press=lambda instance, digit=str(i): self.add_digit(digit))
-            self.keyboard_layout.add_widget(btn)
-        
-        # Дополнительные кнопки
-        clear_btn = Button(text='Очистить', font_size='18sp', background_color=(0, 0, 1, 1))
-        clear_btn.bind(on_press=self.clear_input)
-        self.keyboard_layout.add_widget(clear_btn)
-        
-        zero_btn = Button(text='0', font_size='24sp')
-        zero_btn.bind(on_press=lambda instance: self.add_digit('0'))
-        self.keyboard_layout.add_widget(zero_btn)
-        
-        check_btn = Button(text='Проверить', font_size='18sp', background_color=(0, 1, 0, 1))
-        check_btn.bind(on_press=self.check_answer)
-        self.keyboard_layout.add_widget(check_btn)
-        
-        self.layout.add_widget(self.keyboard_layout)
+        # Место под поле ответа и клавиатуру (наполняет build_input_view):
+        # поле dp(60) + отступ dp(10) + клавиатура dp(220)
+        self.input_layout = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(290), spacing=dp(10))
+        self.layout.add_widget(self.input_layout)
 
         # Уменьшаем блок обратной связи и таймера
-        self.feedback_label = Label(text='', font_size='20sp', size_hint_y=None, height=dp(35))
+        self.feedback_label = CachedLabel(self.text_cache, text='', font_size='20sp', size_hint_y=None, height=dp(35))
         self.layout.add_widget(self.feedback_label)
         
-        self.timer_label = Label(text=f'Время: {self.time_limit}', font_size='20sp', size_hint_y=None, height=dp(35))
+        # Отсчет по дедлайну: текст и полоса меняются, только когда меняется видимое значение
+        self.timer_label = Countdown(self.text_cache, self.on_timer_expired, text=f'Время: {self.time_limit}', font_size='20sp', size_hint_y=None, height=dp(35))
         self.layout.add_widget(self.timer_label)
 
         # Уменьшаем нижние кнопки
         buttons_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(45), spacing=dp(10))
         
         settings_btn = Button(text='Настройки')
-        settings_btn.bind(on_press=self.open_settings_popup)
+        settings_btn.bind(on_press=lambda instance: self.handle_input('settings'))
         buttons_layout.add_widget(settings_btn)
 
+        profiles_btn = Button(text='Профиль')
+        profiles_btn.bind(on_press=lambda instance: self.handle_input('profiles'))
+        buttons_layout.add_widget(profiles_btn)
+
         back_btn = Button(text='Выйти')
         back_btn.bind(on_press=self.go_back)
         buttons_layout.add_widget(back_btn)
@@ -171,84 +203,135 @@ class LearningScreen(Screen):
         self.layout.add_widget(buttons_layout)
 
         self.add_widget(self.layout)
+        self.ui_ready = False
+        self.pending_ui = [self.build_progress_view, self.build_input_view]
         self.toggle_session_widgets(False)
+        if not App.get_running_app().FAST_START:
+            self.ensure_ui()
+
+    def build_deferred_ui(self, dt=0):
+        """Строит следующую отложенную часть экрана; по кадру на часть"""
+        if self.pending_ui:
+            self.pending_ui.pop(0)()
+        if self.pending_ui:
+            self.deferred_ui_event()
+        else:
+            self.finish_ui()
+
+    def ensure_ui(self):
+        """Достраивает экран сразу (нажали "Старт" раньше, чем он достроился)"""
+        if self.ui_ready:
+            return
+        self.deferred_ui_event.cancel()
+        while self.pending_ui:
+            self.pending_ui.pop(0)()
+        self.finish_ui()
+
+    def finish_ui(self):
+        self.ui_ready = True
+        self.toggle_session_widgets(self.session_active)
         self.update_progress_bars()
+        self.prewarm_texts()
+        App.get_running_app().on_ui_ready()
+
+    def build_progress_view(self):
+        from kivy.uix.progressbar import ProgressBar
 
+        # Уменьшаем высоту прогресс-бара
+        self.points_progress_bar = ProgressBar(max=self.target_score, value=self.current_score, size_hint_y=None, height=dp(20))
+        
+        # Уменьшаем высоту и размер шрифта для крупной надписи с очками
+        self.points_big_label = Label(text=f'Набрано {self.current_score} из {self.target_score}', 
+                                     size_hint_y=None, height=dp(40), font_size='22sp', 
+                                     halign='center', valign='middle', bold=True)
+        
+        self.progress_bars_layout.add_widget(self.points_progress_bar)
+        self.progress_bars_layout.add_widget(self.points_big_label)
+
+        # Прогресс изучения со звездами. Делаем компактнее.
+        self.mastery_progress_label = Label(text='Прогресс изучения: 0/0', size_hint_y=None, height=dp(20), halign='left', valign='middle')
+        # Уменьшаем высоту блока со звездами, чтобы они были в один ряд.
+        self.mastery_stars_layout = GridLayout(cols=9, size_hint_y=None, height=dp(30), spacing=dp(3))
+        self.progress_bars_layout.add_widget(self.mastery_progress_label)
+        self.progress_bars_layout.add_widget(self.mastery_stars_layout)
+        self.build_star_pool()
+
+    def build_input_view(self):
+        # Поле ответа: надпись из кэша текстур, сам ответ - строка answer_text
+        self.answer_label = CachedLabel(self.text_cache, text=ANSWER_HINT, font_size='28sp', color=ANSWER_HINT_COLOR,
+                                        background_color=(1, 1, 1, 1), size_hint_y=None, height=dp(60))
+        self.input_layout.add_widget(self.answer_label)
+
+        # Клавиатура одним виджетом: клавиши рисуются на canvas
+        self.keypad = Keypad(self.text_cache, self.on_key, spacing=dp(5), size_hint_y=None, height=dp(220))
+        self.input_layout.add_widget(self.keypad)
+
+    def on_key(self, key):
+        if key == 'clear':
+            self.handle_input('clear')
+        elif key == 'check':
+            self.handle_input('check')
+        else:
+            self.handle_input('digit', key)
+
+    def set_answer(self, text):
+        """Меняет набранный ответ (без цифр показывается подсказка)"""
+        self.answer_text = text
+        if not self.ui_ready:
+            return
+        if text:
+            self.answer_label.text = text
+            self.answer_label.color = ANSWER_COLOR
+        else:
+            self.answer_label.text = ANSWER_HINT
+            self.answer_label.color = ANSWER_HINT_COLOR
+
+    @TRACER.traced('sound')
     def play_fail_sound(self):
         """Воспроизводит случайный звук ошибки"""
-        if self.fail_sounds:
-            fail_sound = random.choice(self.fail_sounds)
-            fail_sound.play()
+        self.sounds.play_random('fail', rng=App.get_running_app().ui_rng)
 
+    @TRACER.traced('sound')
     def play_good_sound(self):
         """Воспроизводит случайный мотивационный звук"""
-        if self.good_sounds:
-            good_sound = random.choice(self.good_sounds)
-            good_sound.play()
+        self.sounds.play_random('good', rng=App.get_running_app().ui_rng)
 
     def show_motivational_popup(self, title, message):
         """Показывает мотивационное сообщение с звуком"""
         self.play_good_sound()
-        
-        label = Label(text=message, halign='center', valign='middle', text_size=(None, None))
-        
-        popup = Popup(title=title,
-                      content=label,
-                      size_hint=(0.8, 0.4),
-                      auto_dismiss=True)
-        
-        # Устанавливаем text_size после создания popup
-        def set_text_size(instance, size):
-            label.text_size = (size[0] * 0.9, None)
-        
-        popup.bind(size=set_text_size)
-        
-        # Автоматически закрываем через 2 секунды
-        Clock.schedule_once(lambda dt: popup.dismiss(), 2.0)
-        popup.open()
-
-    def check_motivational_triggers(self, is_correct, answer_time):
-        """Проверяет условия для показа мотивационных сообщений"""
-        if not is_correct:
-            self.correct_streak = 0
-            self.fast_answers = 0
-            return
-        
-        self.correct_streak += 1
-        self.session_correct += 1
-        
-        # Быстрый ответ (меньше 3 секунд)
-        if answer_time <= 3:
-            self.fast_answers += 1
-        else:
-            self.fast_answers = 0
-        
-        # Мотивационные сообщения только в первом этапе (изучение)
-        if self.current_stage != 1:
-            return
-        
-        # Триггер 1: Серия из 25 правильных ответов подряд (только в этапе 1)
-        if self.correct_streak == 25:
-            messages = [
-                "Отлично! 25 правильных ответов подряд!",
-                "Великолепно! Ты в ударе!",
-                "Потрясающе! Продолжай в том же духе!",
-                "Браво! Ты настоящий математик!"
-            ]
-            self.show_motivational_popup("🎉 Серия!", random.choice(messages))
-        
-        # Триггер 2: Особые достижения в этапе изучения (только в этапе 1)
-        # Проверяем прогресс изучения
-        mastered_count = sum(1 for ex in self.mastery_examples if ex['consecutive_correct'] >= ex['correct_needed'])
-        total_examples = len(self.mastery_examples)
-        
-        # При достижении 50% изучения
-        progress_percent = (mastered_count / total_examples * 100) if total_examples > 0 else 0
-        
-        if progress_percent >= 50 and not hasattr(self, 'shown_50'):
-            self.shown_50 = True
+        # Автоматически закрывается через 2 секунды
+        self.popups.show_motivation(title, message)
+
+    def show_trigger_popups(self, triggers):
+        """Показывает мотивационные сообщения для сработавших триггеров движка"""
+        if TRIGGER_STREAK in triggers:
+            self.show_motivational_popup("🎉 Серия!", App.get_running_app().ui_rng.choice(STREAK_MESSAGES))
+        if TRIGGER_HALF in triggers:
             self.show_motivational_popup("🎯 Половина!", "Половина изучена! Ты справляешься!")
 
+    def prewarm_texts(self):
+        """Закрепляет и рисует заранее строки текущей таблицы: таймер, вопросы, ответы.
+
+        Во втором этапе вопросы уже изученных таблиц рисуются после них,
+        пока помещаются в кэш, не вытесняя строк текущей таблицы.
+        """
+        index = self.engine.index
+        start, end = index.table_range(self.engine.current_learning_table)
+        facts = list(range(start, end))
+        items = self.timer_label.text_keys(self.time_limit)
+        items += [self.question_label.text_key(index.question(fact)) for fact in facts]
+        items += [self.feedback_label.text_key(text) for text in ('Правильно!', 'Введите число')]
+        # Набираемые ответы: все префиксы ответов таблицы
+        for answer in sorted({str(index.answer(fact)) for fact in facts}):
+            items += [self.answer_label.text_key(answer[:i]) for i in range(1, len(answer) + 1)]
+        for answer in sorted({index.answer(fact) for fact in facts}):
+            items.append(self.feedback_label.text_key(f'Неверно! Ответ: {answer}'))
+            items.append(self.feedback_label.text_key(f'Время вышло! Ответ: {answer}'))
+        earlier = []
+        if self.current_stage == 2:
+            earlier = [self.question_label.text_key(index.question(fact)) for fact in range(start)]
+        self.text_cache.prewarm(items, earlier)
+
     def show_timer(self):
         """Показать таймер, скрыть обратную связь"""
         self.timer_label.opacity = 1
@@ -259,72 +342,68 @@ class LearningScreen(Screen):
         self.timer_label.opacity = 0
         self.feedback_label.opacity = 1
 
+    def build_star_pool(self):
+        """Создает постоянный набор звездочек; дальше меняются только текстуры"""
+        # Обе звезды - области одной текстуры атласа (загружен при старте)
+        self.filled_star_texture = UI_ASSETS.texture('star_filled')
+        self.empty_star_texture = UI_ASSETS.texture('star_empty')
+        self.use_star_images = self.filled_star_texture is not None and self.empty_star_texture is not None
+        if not self.use_star_images:
+            log.warning('Звезд нет в атласе, используем текстовые звездочки')
+
+        if self.use_star_images:
+            from kivy.uix.image import Image
+        self.star_widgets = []
+        for i in range(MAX_STARS):
+            if self.use_star_images:
+                star = Image(texture=self.empty_star_texture, size_hint=(1, 1),
+                             allow_stretch=True, keep_ratio=True)  # Используем размер ячейки GridLayout
+            else:
+                # Если изображения не найдены, используем простой лейбл
+                star = Label(text='☆', font_size='16sp', color=(0.5, 0.5, 0.5, 1),
+                             halign='center', valign='middle')
+            star.opacity = 0
+            self.star_widgets.append(star)
+            self.mastery_stars_layout.add_widget(star)
+        # Отображаемое состояние: (видимых звезд, заполненных звезд)
+        self.stars_state = (0, 0)
+
+    def set_star_filled(self, star, filled):
+        if self.use_star_images:
+            star.texture = self.filled_star_texture if filled else self.empty_star_texture
+        elif filled:
+            star.text = '★'
+            star.color = (1, 1, 0, 1)
+        else:
+            star.text = '☆'
+            star.color = (0.5, 0.5, 0.5, 1)
+
     def update_stars_images(self, mastered_count, total_examples):
-        """Обновляет изображения звездочек для отображения прогресса"""
-        print(f"update_stars_images вызван: mastered={mastered_count}, total={total_examples}")
-        
-        # Очищаем старые изображения
-        self.mastery_stars_layout.clear_widgets()
-        
-        if total_examples == 0:
-            print("total_examples равно 0, выходим")
-            return
-        
+        """Обновляет звездочки прогресса, меняя только изменившиеся"""
         # Ограничиваем количество звездочек для лучшего отображения
-        max_stars = min(total_examples, 18)  # Максимум 18 звездочек (2 строки по 9)
+        max_stars = min(total_examples, MAX_STARS)
         
         # Вычисляем сколько звездочек должно быть заполнено
         filled_stars = int((mastered_count / total_examples) * max_stars) if total_examples > 0 else 0
-        
-        print(f"Создаем {max_stars} звезд, из них {filled_stars} заполненных")
-        
-        # Создаем изображения звездочек
-        for i in range(max_stars):
-            if i < filled_stars:
-                # Заполненная звезда
-                star_img = self.create_filled_star_image()
-            else:
-                # Пустая звезда
-                star_img = self.create_empty_star_image()
-            
-            self.mastery_stars_layout.add_widget(star_img)
-    
-    def create_filled_star_image(self):
-        """Создает изображение заполненной звезды"""
-        try:
-            # Используем абсолютный путь
-            star_path = os.path.join(os.path.dirname(__file__), 'star_filled.png')
-            print(f"Путь к заполненной звезде: {star_path}")
-            print(f"Файл существует: {os.path.exists(star_path)}")
-            
-            img = Image(source=star_path, size_hint=(1, 1), allow_stretch=True, keep_ratio=True)  # Используем размер ячейки GridLayout
-            print(f"Загружена заполненная звезда: {img.source}")
-            return img
-        except Exception as e:
-            print(f"Ошибка загрузки star_filled.png: {e}")
-            # Если изображение не найдено, создаем простой лейбл
-            return Label(text='★', font_size='16sp', color=(1, 1, 0, 1), halign='center', valign='middle')
-    
-    def create_empty_star_image(self):
-        """Создает изображение пустой звезды"""
-        try:
-            # Используем абсолютный путь
-            star_path = os.path.join(os.path.dirname(__file__), 'star_empty.png')
-            print(f"Путь к пустой звезде: {star_path}")
-            print(f"Файл существует: {os.path.exists(star_path)}")
-            
-            img = Image(source=star_path, size_hint=(1, 1), allow_stretch=True, keep_ratio=True)  # Используем размер ячейки GridLayout
-            print(f"Загружена пустая звезда: {img.source}")
-            return img
-        except Exception as e:
-            print(f"Ошибка загрузки star_empty.png: {e}")
-            # Если изображение не найдено, создаем простой лейбл
-            return Label(text='☆', font_size='16sp', color=(0.5, 0.5, 0.5, 1), halign='center', valign='middle')
+
+        old_visible, old_filled = self.stars_state
+        if (max_stars, filled_stars) == self.stars_state:
+            return
+        self.stars_state = (max_stars, filled_stars)
+
+        for i, star in enumerate(self.star_widgets):
+            visible = i < max_stars
+            if visible != (i < old_visible):
+                star.opacity = 1 if visible else 0
+            filled = i < filled_stars
+            if filled != (i < old_filled):
+                self.set_star_filled(star, filled)
 
     def toggle_session_widgets(self, active):
         """Enable/disable widgets based on session state."""
-        self.keyboard_layout.disabled = not active
-        self.answer_input.disabled = not active
+        if self.ui_ready:
+            self.keypad.disabled = not active
+            self.answer_label.disabled = not active
         self.question_label.opacity = 1 if active else 0
         self.progress_bars_layout.opacity = 1 if active else 0
         
@@ -338,187 +417,175 @@ class LearningScreen(Screen):
             self.feedback_label.opacity = 0
 
     def start_session(self, instance):
-        if self.session_active:
+        if not self.engine.start_session():
             return
-        self.session_active = True
+        self.ensure_ui()
         self.start_button.disabled = True
         self.stop_button.disabled = False
         self.toggle_session_widgets(True)
 
+        # Фиксируем в журнале состояние начала сессии (набор примеров этапа 1)
         app = App.get_running_app()
-        table_num = getattr(app, 'current_learning_table', 2)
-        self.current_stage = getattr(app, 'current_stage', 1)
-        
-        # Сбрасываем счетчики мотивации
-        self.correct_streak = 0
-        self.fast_answers = 0
-        self.session_correct = 0
-        # Сбрасываем флаг показанного сообщения прогресса
-        if hasattr(self, 'shown_50'):
-            delattr(self, 'shown_50')
-        
-        if self.current_stage == 1:
-            # Stage 1: Mastery of current table examples
-            self.mastery_examples = self.get_examples_for_table(table_num, for_mastery=True)
-            random.shuffle(self.mastery_examples)
-            self.current_score = 0  # Reset score for stage 1
-        else:
-            # Stage 2: Score accumulation with all learned tables
-            self.current_score = app.current_score
-        
+        app.save_progress()
+        app.open_session()
+
         self.feedback_label.text = ''
-        self.answer_input.text = ''
+        self.set_answer('')
         self.show_timer()  # Показываем таймер в начале сессии
         self.update_progress_bars()
+        self.prewarm_texts()
         self.show_current_question()
 
     def stop_session(self, instance=None):
-        if not self.session_active:
+        if not self.engine.stop_session():
             return
-        self.session_active = False
         self.stop_timer()
+        self.answer_pending = False
+        # Переход к следующему вопросу после остановки уже не нужен
+        self.next_question_event.cancel()
+        self.restore_timer_event.cancel()
+        App.get_running_app().close_session()
 
         self.start_button.disabled = False
         self.stop_button.disabled = True
         self.toggle_session_widgets(False)
         
-        app = App.get_running_app()
-        table_num = getattr(app, 'current_learning_table', 2)
+        self.show_idle()
+
+    def show_idle(self):
+        """Экран вне сессии: текущая таблица и этап"""
+        table_num = self.engine.current_learning_table
         stage_text = "Этап 1: Изучение" if self.current_stage == 1 else "Этап 2: Серия"
-        self.title_label.text = f'Таблица на {table_num} ({stage_text})'
+        self.title_label.text = f'{self.engine.index.table_title(table_num)} ({stage_text})'
         self.question_label.text = 'Нажмите "Старт" для начала'
-        self.answer_input.text = ''
+        self.set_answer('')
         self.feedback_label.text = ''
         self.update_progress_bars()
 
     def open_settings_popup(self, instance):
+        self.stop_session()
+        self.popups.show_settings(self.engine.time_limit, lambda time_limit: self.handle_input('time_limit', time_limit))
+
+    def save_settings(self, time_limit):
+        self.engine.time_limit = time_limit
+        App.get_running_app().save_progress()
+
+    def open_profiles_popup(self, instance):
         self.stop_session()
         app = App.get_running_app()
+        self.popups.show_profiles(app.profiles(), app.profile_id, self.select_profile, self.create_profile)
 
-        # Контейнер содержимого попапа. size_hint_y=None, чтобы высота сама подстраивалась под детей,
-        # благодаря чему не остается лишнего пустого пространства в верхней части окна.
-        content = BoxLayout(orientation='vertical', padding=10, spacing=10, size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        
-        title_label = Label(text='Длительность таймера (сек)', size_hint_y=None, height=40)
-        content.add_widget(title_label)
-        
-        slider_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=40)
-        slider_value_label = Label(text=str(int(app.time_limit)), size_hint_x=0.2)
-        
-        slider = Slider(min=5, max=8, value=app.time_limit, step=1)
-        
-        def update_label(instance, value):
-            slider_value_label.text = str(int(value))
-        
-        slider.bind(value=update_label)
-        
-        slider_layout.add_widget(slider)
-        slider_layout.add_widget(slider_value_label)
-        content.add_widget(slider_layout)
-        
-        close_button = Button(text='Сохранить и закрыть', size_hint_y=None, height=50)
-        content.add_widget(close_button)
-
-        # Задаём фиксированную, но компактную высоту попапа, чтобы элементы размещались плотнее друг к другу.
-        popup = Popup(title='Настройки',
-                      content=content,
-                      size_hint=(0.8, None),
-                      height=dp(220))
-
-        def save_and_close(instance):
-            new_time_limit = int(slider.value)
-            app.time_limit = new_time_limit
-            self.time_limit = new_time_limit
-            
-            app.save_progress()
-            popup.dismiss()
+    def select_profile(self, profile_id):
+        App.get_running_app().switch_profile(profile_id)
+        self.show_idle()
 
-        close_button.bind(on_press=save_and_close)
-        
-        popup.open()
-
-    def get_examples_for_table(self, table_num, for_mastery=False):
-        examples = []
-        for i in range(1, 10):
-            # Умножение
-            ex_mul = {'a': table_num, 'b': i, 'op': '*', 'table': table_num}
-            if for_mastery:
-                ex_mul.update({'consecutive_correct': 0, 'correct_needed': 5})
-            examples.append(ex_mul)
-            # Деление
-            ex_div = {'a': table_num * i, 'b': table_num, 'op': '/', 'table': table_num}
-            if for_mastery:
-                ex_div.update({'consecutive_correct': 0, 'correct_needed': 5})
-            examples.append(ex_div)
-        return examples
+    def create_profile(self, name):
+        """Создает профиль и переключается на него; возвращает текст ошибки или None"""
+        try:
+            profile_id = App.get_running_app().create_profile(name)
+        except (ValueError, WriterUnavailable) as e:
+            return str(e)
+        self.select_profile(profile_id)
+        return None
 
     # --- Логика экрана --- #
 
+    def handle_input(self, name, value=None):
+        """Единая точка действий пользователя и срабатываний таймера.
+
+        Действие записывается (если идет запись сессии) и выполняется;
+        SessionReplayer подает записанные действия сюда же.
+        """
+        if name == 'check' and value is None:
+            # Время ответа (секунды, с точностью до мс) снимается в момент нажатия - его и записываем
+            value = round(self.timer_label.elapsed(), 3)
+        recorder = App.get_running_app().recorder
+        if recorder is not None:
+            recorder.record(name, value)
+
+        if name == 'digit':
+            self.add_digit(value)
+        elif name == 'clear':
+            self.clear_input(None)
+        elif name == 'check':
+            self.check_answer(value)
+        elif name == 'timeout':
+            self.handle_timeout()
+        elif name == 'next':
+            self.show_current_question()
+        elif name == 'start':
+            self.start_session(None)
+        elif name == 'stop':
+            self.stop_session()
+        elif name == 'settings':
+            if self.replaying:
+                self.stop_session()
+            else:
+                self.open_settings_popup(None)
+        elif name == 'time_limit':
+            self.save_settings(value)
+        elif name == 'profiles':
+            if self.replaying:
+                self.stop_session()
+            else:
+                self.open_profiles_popup(None)
+        elif name == 'stage2':
+            # Вживую диалог уже закрыт кнопкой, при воспроизведении закрываем сами
+            self.popups.close('mastery_complete')
+            self.start_stage_2()
+        elif name == 'finish':
+            self.popups.close('finish')
+            self.on_finish_dismissed()
+        elif name == 'all_done':
+            self.popups.close('finish')
+            self.on_all_tables_finished()
+        else:
+            log.warning('Неизвестное действие %s', name)
+
     def on_pre_enter(self):
         """Подготовка перед показом экрана"""
         self.stop_session()
 
     def start_timer(self):
-        self.stop_timer()
-        self.remaining_time = self.time_limit
-        self.timer_label.text = f'Время: {self.remaining_time}'
-        self.timer_event = Clock.schedule_interval(self.update_timer, 1)
+        self.timer_label.start(self.time_limit)
 
     def stop_timer(self):
-        if self.timer_event:
-            self.timer_event.cancel()
-            self.timer_event = None
-
-    def update_timer(self, dt):
-        self.remaining_time -= 1
-        self.timer_label.text = f'Время: {self.remaining_time}'
-        if self.remaining_time <= 0:
-            self.handle_timeout()
+        self.timer_label.stop()
+
+    def on_timer_expired(self):
+        if not self.replaying:
+            self.handle_input('timeout')
 
+    def on_question_due(self, dt):
+        """Пауза на обратную связь прошла - следующий вопрос"""
+        if not self.replaying:
+            self.handle_input('next')
+
+    @TRACER.traced('handle_timeout')
     def handle_timeout(self):
         self.stop_timer()
-        if not self.current_example or not self.session_active:
+        self.answer_pending = False
+        result = self.engine.timeout()
+        if result is None:
             return
+        self.answer_started = TRACER.begin()
 
-        if self.current_stage == 1:
-            # Stage 1: Reset consecutive correct count
-            app = App.get_running_app()
-            table_num = app.current_learning_table
-            if self.current_example.get('table') == table_num:
-                self.current_example['consecutive_correct'] = 0
-        else:
-            # Stage 2: Deduct points for timeout (10 points)
-            self.current_score -= 10
-            if self.current_score < 0:
-                self.current_score = 0
-
-        a = self.current_example['a']
-        b = self.current_example['b']
-        op = self.current_example['op']
-
-        if op == '*':
-            correct_answer = a * b
-        else:
-            correct_answer = a // b
-            
-        self.feedback_label.text = f'Время вышло! Ответ: {correct_answer}'
+        self.feedback_label.text = f'Время вышло! Ответ: {result.correct_answer}'
         self.feedback_label.color = (1, 0, 0, 1)
         self.show_feedback()  # Показываем обратную связь
         
         # Воспроизводим звук ошибки
         self.play_fail_sound()
-        
-        # Проверяем мотивационные триггеры (для сброса счетчиков)
-        self.check_motivational_triggers(False, self.time_limit)
 
-        App.get_running_app().current_score = self.current_score
-        App.get_running_app().save_progress()
+        App.get_running_app().record_answer(result)
 
         self.update_progress_bars()
-        Clock.schedule_once(self.show_current_question, 1.0)
+        self.next_question_event()
 
+    @TRACER.traced('update_progress_bars')
     def update_progress_bars(self):
+        if not self.ui_ready:
+            return
         if self.current_stage == 1:
             # Stage 1: Show mastery progress with star images, hide points progress
             self.points_progress_bar.opacity = 0
@@ -526,8 +593,7 @@ class LearningScreen(Screen):
             self.mastery_progress_label.opacity = 1
             self.mastery_stars_layout.opacity = 1
             
-            mastered_count = sum(1 for ex in self.mastery_examples if ex['consecutive_correct'] >= ex['correct_needed'])
-            total_examples = len(self.mastery_examples)
+            mastered_count, total_examples = self.engine.mastery_progress()
             
             # Обновляем изображения звездочек
             self.update_stars_images(mastered_count, total_examples)
@@ -542,52 +608,37 @@ class LearningScreen(Screen):
             self.points_progress_bar.value = self.current_score
             self.points_big_label.text = f'Набрано {self.current_score} из {self.target_score}'
 
+    @TRACER.traced('show_current_question')
     def show_current_question(self, dt=0):
         self.stop_timer()
+        if not self.session_active:
+            return
 
-        if self.current_stage == 1:
-            # Stage 1: Mastery stage
-            unmastered_examples = [ex for ex in self.mastery_examples if ex['consecutive_correct'] < ex['correct_needed']]
-            
-            if not unmastered_examples:
+        with TRACER.span('engine.next_question'):
+            fact = self.engine.next_question()
+        if fact is None:
+            if self.engine.pending == MASTERY_COMPLETE:
                 # All examples mastered, move to stage 2
                 self.show_mastery_complete_popup()
-                return
-            
-            self.current_example = random.choice(unmastered_examples)
-            app = App.get_running_app()
-            table_num = app.current_learning_table
-            self.title_label.text = f'Таблица на {table_num} (Этап 1: Изучение)'
-        else:
-            # Stage 2: Score accumulation stage
-            app = App.get_running_app()
-            table_num = app.current_learning_table
-            
-            if self.current_score >= self.target_score:
+            else:
                 self.show_finish_popup()
-                return
-            
-            # Choose examples from current and previous tables
-            all_examples = []
-            for t in range(2, table_num + 1):
-                all_examples.extend(self.get_examples_for_table(t))
-            
-            self.current_example = random.choice(all_examples)
-            self.title_label.text = f'Таблица на {table_num} (Этап 2: МАРАФОН)'
-
-        if self.click_sound:
-            self.click_sound.play()
-        
-        a = self.current_example['a']
-        b = self.current_example['b']
-        op = self.current_example['op']
+            return
 
-        if op == '*':
-            self.question_label.text = f'{a} × {b} = ?'
+        table_title = self.engine.index.table_title(self.engine.current_learning_table)
+        if self.current_stage == 1:
+            self.title_label.text = f'{table_title} (Этап 1: Изучение)'
         else:
-            self.question_label.text = f'{a} ÷ {b} = ?'
+            self.title_label.text = f'{table_title} (Этап 2: МАРАФОН)'
+
+        self.sounds.play('click')
+        
+        self.question_label.text = self.engine.index.question(fact)
+        # Ответ -> следующий вопрос на экране (включая паузу на обратную связь)
+        TRACER.end('answer_to_question', self.answer_started)
+        self.answer_started = None
 
-        self.answer_input.text = ''
+        self.set_answer('')
+        self.answer_pending = True
         self.feedback_label.text = ''
         self.show_timer()  # Показываем таймер для нового вопроса
         self.start_timer()
@@ -595,10 +646,9 @@ class LearningScreen(Screen):
 
     def show_mastery_complete_popup(self):
         self.stop_timer()
-        app = App.get_running_app()
-        current_table = getattr(app, 'current_learning_table', 2)
-        
-        message_text = f'''Молодец, ты выучил таблицу №{current_table}, теперь новый этап "МАРАФОН".
+        table_title = self.engine.index.table_title(self.engine.current_learning_table)
+
+        message_text = f'''Молодец, ты выучил: {table_title}, теперь новый этап "МАРАФОН".
 
 Набери {self.target_score} очков чтобы перейти к изучению следующей таблицы!
 
@@ -607,160 +657,85 @@ class LearningScreen(Screen):
 Неправильный ответ: -15 очков
 Не успеешь ответить: -10 очков'''
         
-        # Создаем контент с кнопкой
-        content_layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
-        
-        label = Label(text=message_text, 
-                     halign='center', valign='middle', text_size=(None, None))
-        content_layout.add_widget(label)
-        
-        # Добавляем кнопку для перехода к марафону
-        start_button = Button(text='Начать МАРАФОН!', size_hint_y=None, height='50dp',
-                             background_color=(0, 0.8, 0, 1))  # Зеленый цвет
-        content_layout.add_widget(start_button)
-        
-        popup = Popup(title='🏆 Этап завершен!',
-                      content=content_layout,
-                      size_hint=(0.9, 0.8),  # Увеличиваем размер для кнопки
-                      auto_dismiss=False)  # Отключаем автозакрытие при клике вне окна
-        
-        # Устанавливаем text_size после создания popup для правильного расчета размеров
-        def set_text_size(instance, size):
-            label.text_size = (size[0] * 0.9, None)  # 90% от ширины popup
-        
-        popup.bind(size=set_text_size)
-        
-        def start_stage_2(instance):
-            app.current_stage = 2
-            app.current_score = 0
-            self.current_stage = 2
-            self.current_score = 0
-            app.save_progress()
-            popup.dismiss()
-            self.start_session(None)
-        
-        start_button.bind(on_press=start_stage_2)
-        popup.open()
+        self.popups.show_mastery_complete(message_text, lambda: self.handle_input('stage2'))
 
-    def check_answer(self, instance=None):
-        if not self.session_active:
+    def start_stage_2(self):
+        self.engine.start_marathon()
+        App.get_running_app().save_progress()
+        # Сессия первого этапа еще активна - перезапускаем ее уже во втором этапе
+        self.stop_session()
+        self.start_session(None)
+
+    @TRACER.traced('check_answer')
+    def check_answer(self, answer_time=None):
+        """Проверяет набранный ответ; answer_time - секунды на ответ (по умолчанию - с показа вопроса)"""
+        # Повторная проверка во время паузы на обратную связь (например, после
+        # автопроверки) не засчитывает тот же ответ второй раз
+        if not self.session_active or not self.answer_pending:
             return
-        
-        # Вычисляем время ответа
-        answer_time = self.time_limit - self.remaining_time
-        
+
+        if answer_time is None:
+            answer_time = self.timer_label.elapsed()
         self.stop_timer()
-        if not self.current_example:
+        if self.current_fact is None:
             return
 
-        answer_text = self.answer_input.text.strip()
+        answer_text = self.answer_text
         if not answer_text.isdigit():
             self.feedback_label.text = 'Введите число'
             self.feedback_label.color = (1, 0, 0, 1)
             self.show_feedback()  # Показываем обратную связь
-            Clock.schedule_once(lambda dt: self.show_timer(), 1.0)  # Через секунду возвращаем таймер
+            self.restore_timer_event()  # Через секунду возвращаем таймер
             self.start_timer()
             return
 
-        user_answer = int(answer_text)
-        a = self.current_example['a']
-        b = self.current_example['b']
-        op = self.current_example['op']
-        app = App.get_running_app()
-        table_num = app.current_learning_table
-        
-        if op == '*':
-            correct_answer = a * b
-        else:
-            correct_answer = a // b
-
-        is_correct = user_answer == correct_answer
+        self.answer_pending = False
+        self.answer_started = TRACER.begin()
+        with TRACER.span('engine.submit'):
+            result = self.engine.submit(int(answer_text), answer_time)
 
-        if is_correct:
+        if result.is_correct:
             self.feedback_label.text = 'Правильно!'
             self.feedback_label.color = (0, 1, 0, 1)
             self.show_feedback()  # Показываем обратную связь
-            
-            if self.current_stage == 1:
-                # Stage 1: Increment consecutive correct count
-                if self.current_example.get('table') == table_num:
-                    self.current_example['consecutive_correct'] += 1
-            else:
-                # Stage 2: Increment score
-                self.current_score += 1
-            
-            # Проверяем мотивационные триггеры
-            self.check_motivational_triggers(True, answer_time)
-            
-            Clock.schedule_once(self.show_current_question, 1.0)
+            self.show_trigger_popups(result.triggers)
         else:
-            self.feedback_label.text = f'Неверно! Ответ: {correct_answer}'
+            self.feedback_label.text = f'Неверно! Ответ: {result.correct_answer}'
             self.feedback_label.color = (1, 0, 0, 1)
             self.show_feedback()  # Показываем обратную связь
             
             # Воспроизводим звук ошибки
             self.play_fail_sound()
-            
-            if self.current_stage == 1:
-                # Stage 1: Reset consecutive correct count
-                if self.current_example.get('table') == table_num:
-                    self.current_example['consecutive_correct'] = 0
-            else:
-                # Stage 2: Deduct points for incorrect answer (15 points)
-                self.current_score -= 15
-                if self.current_score < 0:
-                    self.current_score = 0
-            
-            # Проверяем мотивационные триггеры (для сброса счетчиков)
-            self.check_motivational_triggers(False, answer_time)
-            
-            Clock.schedule_once(self.show_current_question, 1.0)
-        
-        App.get_running_app().current_score = self.current_score
-        App.get_running_app().save_progress()
+
+        self.next_question_event()
+        App.get_running_app().record_answer(result)
         self.update_progress_bars()
 
     def show_finish_popup(self):
         self.stop_timer()
         app = App.get_running_app()
-        current_table = getattr(app, 'current_learning_table', 2)
+        index = self.engine.index
+        current_title = index.table_title(self.engine.current_learning_table)
+        final_score = self.engine.current_score
 
-        if current_table < 9:
-            app.current_learning_table += 1
-            app.current_stage = 1  # Reset to stage 1 for new table
-            app.current_score = 0
+        if self.engine.complete_table():
             app.save_progress()
-            
-            label = Label(text=f'Вы завершили таблицу на {current_table}!\nПереходим к таблице на {app.current_learning_table}!', 
-                         halign='center', valign='middle', text_size=(None, None))
-            
-            popup = Popup(title='Отлично!',
-                          content=label,
-                          size_hint=(0.8, 0.5))
-            
-            # Устанавливаем text_size после создания popup для правильного расчета размеров
-            def set_text_size(instance, size):
-                label.text_size = (size[0] * 0.9, None)  # 90% от ширины popup
-            
-            popup.bind(size=set_text_size)
-            popup.open()
-            popup.bind(on_dismiss=lambda *args: self.manager.current == 'learning' and self.on_pre_enter())
+            next_title = index.table_title(self.engine.current_learning_table)
+            self.popups.show_finish('Отлично!',
+                                    f'Вы завершили: {current_title}!\nДальше: {next_title}!',
+                                    on_dismiss=lambda: self.handle_input('finish'))
         else:
-            label = Label(text=f'Вы изучили все таблицы умножения от 2 до 9!\nВаш финальный результат: серия из {self.current_score} правильных ответов!', 
-                         halign='center', valign='middle', text_size=(None, None))
-            
-            popup = Popup(title='Поздравляем!',
-                          content=label,
-                          size_hint=(0.8, 0.5))
-            
-            # Устанавливаем text_size после создания popup для правильного расчета размеров
-            def set_text_size(instance, size):
-                label.text_size = (size[0] * 0.9, None)  # 90% от ширины popup
-            
-            popup.bind(size=set_text_size)
-            popup.open()
-            popup.bind(on_dismiss=lambda *args: app.reset_learning_progress())
-            popup.bind(on_dismiss=lambda *args: self.manager.current == 'learning' and self.on_pre_enter())
+            self.popups.show_finish('Поздравляем!',
+                                    f'Вы изучили все таблицы {index.subject} {index.range_text()}!\nВаш финальный результат: серия из {final_score} правильных ответов!',
+                                    on_dismiss=lambda: self.handle_input('all_done'))
+
+    def on_finish_dismissed(self):
+        if self.manager.current == 'learning':
+            self.on_pre_enter()
+
+    def on_all_tables_finished(self):
+        App.get_running_app().reset_learning_progress()
+        self.on_finish_dismissed()
 
     def go_back(self, *args):
         self.stop_session()
@@ -768,76 +743,305 @@ class LearningScreen(Screen):
         App.get_running_app().stop()
 
     def add_digit(self, digit):
-        if not self.session_active:
+        if not self.session_active or len(self.answer_text) >= MAX_ANSWER_DIGITS:
             return
-        self.answer_input.text += digit
+        self.set_answer(self.answer_text + digit)
+        # Автопроверка, когда набрано столько цифр, сколько в ответе. Проверка
+        # идет через handle_input и попадает в запись, поэтому при
+        # воспроизведении она приходит из записи, а не отсюда
+        if (App.get_running_app().AUTO_SUBMIT and self.answer_pending and not self.replaying
+                and len(self.answer_text) == len(str(self.engine.index.answer(self.current_fact)))):
+            self.handle_input('check')
 
     def clear_input(self, instance):
         if not self.session_active:
             return
-        self.answer_input.text = ''
+        self.set_answer('')
 
 
 class LearningApp(App):
-    current_learning_table = 2
-    time_limit = 7
-    current_score = 0
-    current_stage = 1  # 1 = mastery stage, 2 = score stage
-    PROGRESS_FILE = 'progress.json'
+    PROFILE_DB = 'profiles.db'
+    LEGACY_PROGRESS_FILE = 'progress.json'  # Прогресс до появления профилей (импортируется один раз)
+    EVENT_LOG_DIR = 'events'                # Журналы профилей: events/<id профиля>
+    DEFAULT_PROFILE_NAME = 'Ученик'
+    PROBLEM_SPACE = 'classic'  # Набор таблиц из problems.PROBLEM_SPACES
+    # Отладка производительности: трассировка и оверлей (MT_PERF_HUD=1)
+    PERF_HUD = os.environ.get('MT_PERF_HUD') == '1'
+    TRACE_FILE = 'trace.json'  # В user_data_dir, открывается в ui.perfetto.dev
+    STALL_REPORT_FILE = 'stalls.log'  # Отчеты о зависаниях главного потока (в user_data_dir)
+    STALL_BUDGET = 0.05               # Пауза между кадрами, после которой считаем зависание
+    # Журнал: с LOG_LEVEL записи печатаются, с LOG_BUFFER_LEVEL копятся в памяти
+    # и выводятся только вместе с ошибкой (в консоль и в LOG_DUMP_FILE)
+    LOG_LEVEL = os.environ.get('MT_LOG', 'warning')
+    LOG_BUFFER_LEVEL = 'info'
+    LOG_DUMP_FILE = 'errors.log'
+    # Запись сессий (seed и действия пользователя) для воспроизведения ошибок:
+    # последние RECORDINGS_KEEP файлов в user_data_dir/recordings, MT_RECORD=0 - не писать
+    RECORD_SESSIONS = os.environ.get('MT_RECORD', '1') != '0'
+    RECORDINGS_DIR = 'recordings'
+    RECORDINGS_KEEP = 5
+    RNG_SEED = os.environ.get('MT_SEED')  # Постоянный seed вместо случайного
+    # Быстрый старт: сначала стартовый вид, скрытые части экрана - в свободных кадрах
+    FAST_START = os.environ.get('MT_FAST_START', '1') != '0'
+    AUTO_SUBMIT = os.environ.get('MT_AUTO_SUBMIT') == '1'  # Проверять ответ, как только набраны все цифры
+    BOOT_REPORT_FILE = 'boot.json'  # Отчет о старте с MT_BOOT_PROFILE=1 (в user_data_dir)
 
     def build(self):
-        self.load_progress()
+        applog.configure(self.LOG_LEVEL, self.LOG_BUFFER_LEVEL,
+                         dump_path=os.path.join(self.user_data_dir, self.LOG_DUMP_FILE))
+        TRACER.enabled = self.PERF_HUD
+        # Все случайные выборы - из генераторов приложения, засеянных seed_rngs
+        self.rng = random.Random()
+        self.ui_rng = random.Random()
+        self.seed = None
+        self.recorder = None
+        self.engine = TrainerEngine(rng=self.rng, index=space_index(self.PROBLEM_SPACE))
+        self.profile_store = ProfileStore(self.PROFILE_DB)
+        self.profile_id = None
+        self.session_id = None
+        self.event_log = None
+        self.import_legacy_progress()
+        profile_id = self.profile_store.last_profile()
+        if profile_id is None:
+            profile_id = self.profile_store.create_profile(self.DEFAULT_PROFILE_NAME)
+        self.load_profile(profile_id)
+        self.start_recording()
+        BOOT.mark('profile')
+        self.first_frame_shown = False
         self.title = 'Изучение таблицы умножения'
+        # App.run() создает окно после build(), а атлас и надписи из кэша - текстуры,
+        # им нужен контекст GL уже сейчас
+        from kivy.core.window import Window  # noqa: F401
+        BOOT.mark('window')
+        UI_ASSETS.preload()
+        BOOT.mark('assets')
         sm = ScreenManager()
         sm.add_widget(LearningScreen(name='learning'))
+        self.watchdog = Watchdog(os.path.join(self.user_data_dir, self.STALL_REPORT_FILE), budget=self.STALL_BUDGET)
+        Clock.schedule_interval(self.watchdog.tick, 0)
+        # Первые кадры строят интерфейс - следим с момента, когда он уже на экране
+        Clock.schedule_once(self.watchdog.start, 1.0)
+        Clock.schedule_once(self.on_first_frame, 0)
+        BOOT.mark('build')
         return sm
+
+    def on_first_frame(self, dt):
+        """Первый тик главного цикла: стартовый вид на экране, достраиваем остальное"""
+        BOOT.mark('first_frame')
+        self.first_frame_shown = True
+        screen = self.root.get_screen('learning')
+        if screen.ui_ready:
+            self.on_ui_ready()
+        else:
+            screen.deferred_ui_event()
+
+    def on_ui_ready(self):
+        """Экран достроен - конец замера старта"""
+        if not self.first_frame_shown:
+            return
+        BOOT.mark('interactive')
+        BOOT.finish(TRACER, os.path.join(self.user_data_dir, self.BOOT_REPORT_FILE))
     
     def on_stop(self):
-        self.save_progress()
-
-    def save_progress(self):
-        try:
-            progress_data = {
-                'current_learning_table': self.current_learning_table,
-                'time_limit': self.time_limit,
-                'current_score': self.current_score,
-                'current_stage': self.current_stage
-            }
-            with open(self.PROGRESS_FILE, 'w') as f:
-                json.dump(progress_data, f)
-        except IOError as e:
-            print(f"Ошибка сохранения прогресса: {e}")
-
-    def load_progress(self):
-        if os.path.exists(self.PROGRESS_FILE):
-            try:
-                with open(self.PROGRESS_FILE, 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        self.current_learning_table = data.get('current_learning_table', 2)
-                        self.time_limit = data.get('time_limit', 7)
-                        self.current_score = data.get('current_score', 0)
-                        self.current_stage = data.get('current_stage', 1)
-                    else:
-                        self.current_learning_table = 2
-                        self.time_limit = 7
-                        self.current_score = 0
-                        self.current_stage = 1
-            except (IOError, json.JSONDecodeError):
-                self.current_learning_table = 2
-                self.time_limit = 7
-                self.current_score = 0
-                self.current_stage = 1
+        # App.stop() (кнопка "назад") вызывает on_stop, а затем run() - еще раз
+        if self.profile_store.db is None:
+            return
+        self.watchdog.stop()
+        self.stop_recording()
+        self.close_profile()
+        self.profile_store.close()
+        self.export_trace()
+
+    def on_pause(self):
+        # Приложение может быть выгружено системой - записываем прогресс сразу
+        self.watchdog.pause()
+        if self.recorder is not None:
+            self.recorder.flush()
+        self.event_log.sync()
+        self.write_snapshot()
+        self.profile_store.flush()
+        self.export_trace()
+        return True
+
+    def export_trace(self):
+        if TRACER.enabled:
+            path = os.path.join(self.user_data_dir, self.TRACE_FILE)
+            TRACER.export(path)
+            log.info('Трасса сохранена: %s', path)
+
+    def on_resume(self):
+        self.watchdog.resume()
+
+    # --- Профили --- #
+
+    def profiles(self):
+        return self.profile_store.profiles()
+
+    def create_profile(self, name):
+        """Создает профиль (ValueError, если имя пустое или занято)"""
+        return self.profile_store.create_profile(name, self.fresh_state())
+
+    def fresh_state(self):
+        engine = TrainerEngine(index=self.engine.index)
+        engine.time_limit = self.engine.time_limit
+        return engine.snapshot(include_stats=False)
+
+    def switch_profile(self, profile_id):
+        if profile_id == self.profile_id:
+            return
+        self.stop_recording()
+        self.close_profile()
+        self.load_profile(profile_id)
+        self.start_recording()
+
+    def load_profile(self, profile_id):
+        """Загружает состояние профиля и досчитывает его по журналу профиля"""
+        state, stats = self.profile_store.load(profile_id)
+        self.engine.restore(state)
+        self.engine.stats = stats
+        self.profile_id = profile_id
+        self.event_log = EventLog(os.path.join(self.EVENT_LOG_DIR, str(profile_id)))
+        replayed = self.replay_event_log(self.event_log, state.get('log_position'), profile_id)
+        log.info('Профиль %s: таблица %s, этап %s, событий из журнала %s', profile_id,
+                 self.engine.current_learning_table, self.engine.current_stage, replayed)
+        if replayed:
+            # Ответы из журнала не успели попасть в базу - записываем их сейчас
+            self.event_log.open(self.engine.snapshot())
+            self.write_snapshot()
+            self.profile_store.flush()
         else:
-            self.current_learning_table = 2
-            self.time_limit = 7
-            self.current_score = 0
-            self.current_stage = 1
+            self.event_log.open(self.engine.snapshot())
+
+    def close_profile(self):
+        self.close_session()
+        self.write_snapshot()
+        self.profile_store.flush()
+        self.event_log.close()
+
+    def replay_event_log(self, event_log, position, profile_id=None):
+        """Досчитывает состояние по событиям журнала после снимка.
+
+        Ответы из журнала добавляются в историю профиля profile_id (если задан).
+        Возвращает число воспроизведенных событий.
+        """
+        count = 0
+        for event in event_log.replay(position):
+            count += 1
+            if isinstance(event, StateEvent):
+                stats = self.engine.stats
+                self.engine.restore(event.state)
+                if 'fact_stats' not in event.state:
+                    self.engine.stats = stats
+            elif event.stage == self.engine.current_stage:
+                self.engine.apply_answer(event.fact, event.is_correct, event.timed_out, event.latency,
+                                         event.timestamp)
+            if profile_id is not None and not isinstance(event, StateEvent):
+                self.profile_store.add_answer(profile_id, None, event.fact,
+                                              None if event.timed_out else event.answer, event.is_correct,
+                                              event.timed_out, event.latency, event.stage, event.timestamp)
+        self.engine.stop_session()
+        return count
+
+    def import_legacy_progress(self):
+        """Однократно переносит progress.json и его журнал в профиль по умолчанию"""
+        if not os.path.exists(self.LEGACY_PROGRESS_FILE) or self.profile_store.profiles():
+            return
+        # Если основной файл поврежден, вернется предыдущий удачный снимок (.bak)
+        data = load_progress(self.LEGACY_PROGRESS_FILE)
+        self.engine.restore(data if data is not None else {})
+        legacy_log = EventLog(self.EVENT_LOG_DIR)
+        self.replay_event_log(legacy_log, data.get('log_position') if data is not None else None)
+        self.profile_store.create_profile(self.DEFAULT_PROFILE_NAME, self.engine.snapshot(include_stats=False),
+                                          self.engine.stats)
+        log.info('Импортирован %s', self.LEGACY_PROGRESS_FILE)
+        try:
+            os.replace(self.LEGACY_PROGRESS_FILE, self.LEGACY_PROGRESS_FILE + '.imported')
+            for generation in legacy_log.generations():
+                os.remove(legacy_log.segment_path(generation))
+        except OSError as e:
+            log.error('Не удалось убрать старый файл прогресса: %s', e)
+
+    # --- Случайность и запись сессий --- #
+
+    def seed_rngs(self, seed):
+        """Засевает генераторы приложения.
+
+        Звуки и сообщения берут случайность из отдельного генератора: выбор
+        звука зависит от того, что уже загружено в фоне, и не должен сдвигать
+        последовательность вопросов.
+        """
+        self.seed = seed
+        self.rng.seed(seed)
+        self.ui_rng.seed(seed + 1)
+
+    def start_recording(self):
+        """Новый seed и (если запись включена) новый файл записи с текущим состоянием"""
+        self.stop_recording()
+        self.seed_rngs(int(self.RNG_SEED) if self.RNG_SEED else random.randrange(2 ** 32))
+        if not self.RECORD_SESSIONS:
+            return
+        directory = os.path.join(self.user_data_dir, self.RECORDINGS_DIR)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            prune_recordings(directory, self.RECORDINGS_KEEP - 1)
+            path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{self.profile_id}.jsonl')
+            self.recorder = SessionRecorder(path, self.seed, self.engine.snapshot())
+        except (IOError, OSError) as e:
+            log.error('Не удалось начать запись сессии: %s', e)
+            return
+        log.info('Запись сессии: %s (seed %s)', path, self.seed)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    # --- Сессии и ответы --- #
+
+    def open_session(self):
+        self.close_session()
+        self.session_id = self.profile_store.open_session(self.profile_id, self.engine.current_learning_table,
+                                                          self.engine.current_stage)
+        log.info('Сессия %s: таблица %s, этап %s', self.session_id, self.engine.current_learning_table,
+                 self.engine.current_stage)
+
+    def close_session(self):
+        if self.session_id is not None:
+            self.profile_store.close_session(self.session_id)
+            self.session_id = None
+
+    @TRACER.traced('record_answer')
+    def record_answer(self, result):
+        """Дописывает ответ в журнал и историю профиля и обновляет снимок прогресса"""
+        log.debug('Ответ на %s: %s (%s), %.2f с', result.fact, result.answer,
+                  'верно' if result.is_correct else 'неверно', result.answer_time)
+        self.event_log.append_answer(result.fact, result.answer, result.is_correct, result.timed_out,
+                                     result.answer_time, result.stage)
+        self.profile_store.add_answer(self.profile_id, self.session_id, result.fact, result.answer,
+                                      result.is_correct, result.timed_out, result.answer_time, result.stage)
+        self.write_snapshot()
+
+    @TRACER.traced('save_progress')
+    def save_progress(self):
+        """Фиксирует изменение состояния (этап, таблица, настройки) в журнале и профиле"""
+        self.event_log.append_state(self.engine.snapshot())
+        self.write_snapshot()
+        self.profile_store.flush(wait=False)
+
+    @TRACER.traced('write_snapshot')
+    def write_snapshot(self):
+        """Отдает состояние профиля на запись пачкой (не блокирует UI)"""
+        if self.event_log.needs_rollover():
+            self.event_log.rollover(self.engine.snapshot())
+            written = self.profile_store.last_committed
+            self.event_log.compact(written.get('log_position') if written else None)
+        snapshot = self.engine.snapshot(include_stats=False)
+        snapshot['session_active'] = False
+        snapshot['log_position'] = self.event_log.position()
+        self.profile_store.save_state(self.profile_id, snapshot, self.engine.stats)
 
     def reset_learning_progress(self):
-        self.current_learning_table = 2
-        self.current_score = 0
-        self.current_stage = 1
+        self.engine.reset()
         self.save_progress()
 
 
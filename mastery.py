@@ -0,0 +1,67 @@
+"""Счетчики изучения примеров первого этапа с инкрементальным учетом.
+
+MasteryTracker хранит для каждого примера таблицы число правильных ответов
+подряд и поддерживает список неизученных примеров и число изученных при
+каждом ответе. Ответ и запрос прогресса выполняются за O(1) независимо от
+числа примеров; список неизученных - начальный набор для планировщика
+вопросов (scheduler).
+"""
+from array import array
+
+
+class MasteryTracker:
+    """Изучение примеров с номерами start..start+len(facts)-1"""
+
+    def __init__(self, start=0, facts=(), correct_needed=5, counts=None):
+        self.start = start
+        self.correct_needed = correct_needed
+        self.facts = list(facts)  # Порядок примеров (перемешанный при создании сессии)
+        size = len(self.facts)
+        self.counts = array('B', counts if counts is not None else bytes(size))
+        # Неизученные примеры и позиция каждого из них в списке (-1 - изучен)
+        self.unmastered = []
+        self.positions = array('i', [-1]) * size
+        for fact in self.facts:
+            if self.counts[fact - start] < correct_needed:
+                self._add(fact - start)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def mastered_count(self):
+        return len(self.counts) - len(self.unmastered)
+
+    def contains(self, fact):
+        return 0 <= fact - self.start < len(self.counts)
+
+    def is_mastered(self, fact):
+        return self.counts[fact - self.start] >= self.correct_needed
+
+    def _add(self, k):
+        self.positions[k] = len(self.unmastered)
+        self.unmastered.append(k + self.start)
+
+    def _remove(self, k):
+        # Меняем местами с последним и удаляем из конца - O(1)
+        i = self.positions[k]
+        last = self.unmastered.pop()
+        if last != k + self.start:
+            self.unmastered[i] = last
+            self.positions[last - self.start] = i
+        self.positions[k] = -1
+
+    def record(self, fact, is_correct):
+        """Учитывает ответ на пример (ошибка и тайм-аут сбрасывают серию)"""
+        k = fact - self.start
+        count = self.counts[k]
+        if is_correct:
+            if count < self.correct_needed:
+                count += 1
+                self.counts[k] = count
+                if count == self.correct_needed:
+                    self._remove(k)
+        elif count:
+            self.counts[k] = 0
+            if count >= self.correct_needed:
+                self._add(k)
@@ -0,0 +1,44 @@
+"""Отладочный оверлей производительности.
+
+Показывает поверх экрана время кадра и p50/p95 самых долгих интервалов из
+трассировщика (tracing.TRACER). Текст обновляется дважды в секунду, время
+кадра снимается каждый кадр.
+"""
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivy.uix.label import Label
+
+HUD_SPANS = 6  # Сколько интервалов показывать (самые долгие по p95)
+
+
+class PerfHud(Label):
+    """Полупрозрачная надпись в правом верхнем углу экрана"""
+
+    def __init__(self, tracer, **kwargs):
+        kwargs.setdefault('size_hint', (None, None))
+        kwargs.setdefault('size', (dp(260), dp(150)))
+        kwargs.setdefault('pos_hint', {'right': 1, 'top': 1})
+        kwargs.setdefault('font_size', '11sp')
+        kwargs.setdefault('color', (1, 1, 0, 0.85))
+        kwargs.setdefault('halign', 'right')
+        kwargs.setdefault('valign', 'top')
+        super().__init__(**kwargs)
+        self.text_size = self.size
+        self.tracer = tracer
+        self._frame_event = Clock.schedule_interval(self._on_frame, 0)
+        self._refresh_event = Clock.schedule_interval(self.refresh, 0.5)
+
+    def _on_frame(self, dt):
+        self.tracer.frame(dt)
+
+    def refresh(self, *args):
+        frame_p50, frame_p95 = self.tracer.frame_stats()
+        lines = [f'кадр {frame_p50:.1f} / {frame_p95:.1f} мс']
+        stats = sorted(self.tracer.span_stats().items(), key=lambda item: item[1][2], reverse=True)
+        for name, (count, p50, p95) in stats[:HUD_SPANS]:
+            lines.append(f'{name} {p50:.1f} / {p95:.1f} мс ({count})')
+        self.text = '\n'.join(lines)
+
+    def stop(self):
+        self._frame_event.cancel()
+        self._refresh_event.cancel()
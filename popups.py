@@ -0,0 +1,274 @@
+"""Пул переиспользуемых диалогов.
+
+Каждый тип диалога (мотивационное сообщение, завершение этапа, завершение
+таблицы, настройки, выбор профиля) строится один раз, а при показе в него подставляется
+новый текст. Обработчики кнопок и закрытия привязываются к виджетам один раз
+при построении; колбэки конкретного показа хранятся в диалоге и сбрасываются
+при закрытии, поэтому повторные показы не плодят привязанных лямбд.
+Открываются диалоги через open_popup: ModalView.open() в Kivy 2.3 при
+каждом показе заново привязывает к попапу _align_center и не отвязывает.
+Модули Popup, Slider и TextInput импортируются при построении первого
+диалога, а не при старте приложения.
+"""
+from collections import deque
+
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+
+
+def open_popup(popup):
+    """popup.open() без накопления привязок center/size от прошлых показов"""
+    if not popup._is_open:
+        popup.funbind('center', popup._align_center)
+        popup.funbind('size', popup._align_center)
+    popup.open()
+
+
+class MessageDialog:
+    """Диалог с текстом и необязательной кнопкой действия"""
+
+    def __init__(self, size_hint, auto_dismiss=True, button_text=None, button_color=None):
+        self.label = Label(halign='center', valign='middle', text_size=(None, None))
+        if button_text is None:
+            content = self.label
+            self.button = None
+        else:
+            content = BoxLayout(orientation='vertical', spacing=10, padding=10)
+            content.add_widget(self.label)
+            self.button = Button(text=button_text, size_hint_y=None, height='50dp',
+                                 background_color=button_color or (1, 1, 1, 1))
+            self.button.bind(on_press=self._on_action)
+            content.add_widget(self.button)
+
+        from kivy.uix.popup import Popup
+        self.popup = Popup(content=content, size_hint=size_hint, auto_dismiss=auto_dismiss)
+        # Устанавливаем text_size по размеру popup для правильного переноса строк
+        self.popup.bind(size=self._on_size, on_dismiss=self._on_dismiss)
+        self.is_open = False
+        self._on_action_callback = None
+        self._on_dismiss_callback = None
+
+    def _on_size(self, instance, size):
+        self.label.text_size = (size[0] * 0.9, None)  # 90% от ширины popup
+
+    def show(self, title, text, on_action=None, on_dismiss=None):
+        self.popup.title = title
+        self.label.text = text
+        self._on_action_callback = on_action
+        self._on_dismiss_callback = on_dismiss
+        self.is_open = True
+        open_popup(self.popup)
+
+    def dismiss(self, *args):
+        if self.is_open:
+            self.popup.dismiss()
+
+    def cancel(self):
+        """Закрывает диалог сразу, без анимации и обратных вызовов (их действие уже выполнено)"""
+        self._on_action_callback = None
+        self._on_dismiss_callback = None
+        if self.is_open:
+            self.popup.dismiss(animation=False)
+
+    def _on_action(self, instance):
+        callback = self._on_action_callback
+        self._on_action_callback = None
+        self.dismiss()
+        if callback is not None:
+            callback()
+
+    def _on_dismiss(self, instance):
+        self.is_open = False
+        callback = self._on_dismiss_callback
+        self._on_action_callback = None
+        self._on_dismiss_callback = None
+        if callback is not None:
+            callback()
+
+
+class SettingsDialog:
+    """Диалог настройки длительности таймера"""
+
+    def __init__(self):
+        # Контейнер содержимого попапа. size_hint_y=None, чтобы высота сама подстраивалась под детей,
+        # благодаря чему не остается лишнего пустого пространства в верхней части окна.
+        content = BoxLayout(orientation='vertical', padding=10, spacing=10, size_hint_y=None)
+        content.bind(minimum_height=content.setter('height'))
+
+        title_label = Label(text='Длительность таймера (сек)', size_hint_y=None, height=40)
+        content.add_widget(title_label)
+
+        slider_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=40)
+        self.value_label = Label(size_hint_x=0.2)
+        from kivy.uix.slider import Slider
+        self.slider = Slider(min=5, max=8, step=1)
+        self.slider.bind(value=self._on_value)
+        slider_layout.add_widget(self.slider)
+        slider_layout.add_widget(self.value_label)
+        content.add_widget(slider_layout)
+
+        close_button = Button(text='Сохранить и закрыть', size_hint_y=None, height=50)
+        close_button.bind(on_press=self._on_save)
+        content.add_widget(close_button)
+
+        # Задаём фиксированную, но компактную высоту попапа, чтобы элементы размещались плотнее друг к другу.
+        from kivy.uix.popup import Popup
+        self.popup = Popup(title='Настройки', content=content, size_hint=(0.8, None), height=dp(220))
+        self.popup.bind(on_dismiss=self._on_dismiss)
+        self._on_save_callback = None
+
+    def _on_value(self, instance, value):
+        self.value_label.text = str(int(value))
+
+    def show(self, time_limit, on_save):
+        self.slider.value = time_limit
+        self.value_label.text = str(int(time_limit))
+        self._on_save_callback = on_save
+        open_popup(self.popup)
+
+    def _on_save(self, instance):
+        callback = self._on_save_callback
+        self._on_save_callback = None
+        self.popup.dismiss()
+        if callback is not None:
+            callback(int(self.slider.value))
+
+    def _on_dismiss(self, instance):
+        self._on_save_callback = None
+
+
+class ProfilesDialog:
+    """Выбор профиля ученика и создание нового"""
+
+    def __init__(self):
+        content = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        # Кнопки профилей пересоздаются при каждом показе (их немного)
+        self.list_layout = BoxLayout(orientation='vertical', spacing=5)
+        content.add_widget(self.list_layout)
+
+        self.error_label = Label(size_hint_y=None, height=30, color=(1, 0.3, 0.3, 1))
+        content.add_widget(self.error_label)
+
+        new_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=50, spacing=10)
+        from kivy.uix.textinput import TextInput
+        self.name_input = TextInput(hint_text='Имя', multiline=False)
+        new_layout.add_widget(self.name_input)
+        add_button = Button(text='Добавить', size_hint_x=0.4)
+        add_button.bind(on_press=self._on_create)
+        new_layout.add_widget(add_button)
+        content.add_widget(new_layout)
+
+        from kivy.uix.popup import Popup
+        self.popup = Popup(title='Профиль', content=content, size_hint=(0.9, 0.8))
+        self.popup.bind(on_dismiss=self._on_dismiss)
+        self._on_select_callback = None
+        self._on_create_callback = None
+
+    def show(self, profiles, current_id, on_select, on_create):
+        """on_create(имя) возвращает текст ошибки или None"""
+        self.list_layout.clear_widgets()
+        for profile_id, name in profiles:
+            button = Button(text=name, size_hint_y=None, height=50,
+                            background_color=(0, 0.8, 0, 1) if profile_id == current_id else (1, 1, 1, 1))
+            button.profile_id = profile_id
+            button.bind(on_press=self._on_select)
+            self.list_layout.add_widget(button)
+        self.name_input.text = ''
+        self.error_label.text = ''
+        self._on_select_callback = on_select
+        self._on_create_callback = on_create
+        open_popup(self.popup)
+
+    def _on_select(self, instance):
+        callback = self._on_select_callback
+        self.popup.dismiss()
+        if callback is not None:
+            callback(instance.profile_id)
+
+    def _on_create(self, instance):
+        callback = self._on_create_callback
+        if callback is None:
+            return
+        error = callback(self.name_input.text)
+        if error:
+            self.error_label.text = error
+        else:
+            self.popup.dismiss()
+
+    def _on_dismiss(self, instance):
+        self._on_select_callback = None
+        self._on_create_callback = None
+
+
+class PopupManager:
+    """Создает каждый диалог один раз и переиспользует его"""
+
+    MOTIVATION_SECONDS = 2.0  # Мотивационное сообщение закрывается само
+
+    def __init__(self):
+        self.dialogs = {}
+        self._auto_close_event = None
+        self._queued_messages = deque()
+
+    def dialog(self, kind):
+        dialog = self.dialogs.get(kind)
+        if dialog is None:
+            dialog = self.dialogs[kind] = self._build(kind)
+        return dialog
+
+    def _build(self, kind):
+        if kind == 'motivational':
+            return MessageDialog(size_hint=(0.8, 0.4), auto_dismiss=True)
+        if kind == 'mastery_complete':
+            # Отключаем автозакрытие при клике вне окна, закрывается только кнопкой
+            return MessageDialog(size_hint=(0.9, 0.8), auto_dismiss=False,
+                                 button_text='Начать МАРАФОН!', button_color=(0, 0.8, 0, 1))
+        if kind == 'finish':
+            return MessageDialog(size_hint=(0.8, 0.5))
+        if kind == 'settings':
+            return SettingsDialog()
+        if kind == 'profiles':
+            return ProfilesDialog()
+        raise ValueError(f'Неизвестный диалог: {kind}')
+
+    def prebuild(self, *args):
+        """Строит все диалоги заранее (вызывается в свободное время после старта)"""
+        for kind in ('motivational', 'mastery_complete', 'finish', 'settings', 'profiles'):
+            self.dialog(kind)
+
+    def show_motivation(self, title, message):
+        """Мотивационное сообщение; если предыдущее еще открыто - покажем после него"""
+        dialog = self.dialog('motivational')
+        if dialog.is_open:
+            self._queued_messages.append((title, message))
+            return
+        dialog.show(title, message, on_dismiss=self._on_motivation_dismissed)
+        if self._auto_close_event is None:
+            self._auto_close_event = Clock.create_trigger(dialog.dismiss, self.MOTIVATION_SECONDS)
+        self._auto_close_event()
+
+    def _on_motivation_dismissed(self):
+        self._auto_close_event.cancel()
+        if self._queued_messages:
+            self.show_motivation(*self._queued_messages.popleft())
+
+    def close(self, kind):
+        """Закрывает диалог kind без его обратных вызовов, если он открыт"""
+        dialog = self.dialogs.get(kind)
+        if dialog is not None:
+            dialog.cancel()
+
+    def show_mastery_complete(self, text, on_start):
+        self.dialog('mastery_complete').show('🏆 Этап завершен!', text, on_action=on_start)
+
+    def show_finish(self, title, text, on_dismiss):
+        self.dialog('finish').show(title, text, on_dismiss=on_dismiss)
+
+    def show_settings(self, time_limit, on_save):
+        self.dialog('settings').show(time_limit, on_save)
+
+    def show_profiles(self, profiles, current_id, on_select, on_create):
+        self.dialog('profiles').show(profiles, current_id, on_select, on_create)
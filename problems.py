@@ -0,0 +1,71 @@
+"""Реестр видов примеров и наборов таблиц.
+
+Вид примера (ProblemKind) описывает, как из номера таблицы и множителя
+получить операнды, как посчитать ответ, как показать вопрос и как назвать
+таблицу на экране. Набор таблиц
+(PROBLEM_SPACES) задает диапазон таблиц, диапазон множителей и виды
+примеров; по нему FactIndex вычисляет примеры на лету, ничего не храня.
+
+Новый вид регистрируется через register_kind, новый набор - добавлением
+записи в PROBLEM_SPACES.
+"""
+import operator
+
+
+class ProblemKind:
+    """Вид примера: операнды по (таблица, множитель), ответ, текст вопроса и название таблицы"""
+
+    __slots__ = ('name', 'operands', 'answer', 'template', 'subject', 'table_template')
+
+    def __init__(self, name, operands, answer, template, subject, table_template='Таблица на {table}'):
+        self.name = name
+        self.operands = operands  # (таблица, множитель) -> (a, b)
+        self.answer = answer      # (a, b) -> ответ
+        self.template = template  # Текст вопроса с полями {a} и {b}
+        self.subject = subject    # "Таблицы ...": умножения, деления
+        # Название таблицы: поля {table} и {first}, {last} - первый операнд первого и последнего примера
+        self.table_template = table_template
+
+    def question(self, a, b):
+        return self.template.format(a=a, b=b)
+
+
+PROBLEM_KINDS = {}
+
+
+def register_kind(kind):
+    PROBLEM_KINDS[kind.name] = kind
+    return kind
+
+
+def get_kind(name):
+    try:
+        return PROBLEM_KINDS[name]
+    except KeyError:
+        raise ValueError(f'Неизвестный вид примеров: {name}') from None
+
+
+def _square_operands(table, factor):
+    # Таблица t - квадраты чисел 10(t-1)+1 .. 10t
+    n = (table - 1) * 10 + factor
+    return n, n
+
+
+register_kind(ProblemKind('mul', lambda table, factor: (table, factor), operator.mul, '{a} × {b} = ?', 'умножения'))
+register_kind(ProblemKind('div', lambda table, factor: (table * factor, table), operator.floordiv, '{a} ÷ {b} = ?',
+                          'деления'))
+register_kind(ProblemKind('add', lambda table, factor: (table, factor), operator.add, '{a} + {b} = ?', 'сложения'))
+register_kind(ProblemKind('sub', lambda table, factor: (table + factor, table), operator.sub, '{a} − {b} = ?',
+                          'вычитания'))
+register_kind(ProblemKind('square', _square_operands, operator.mul, '{a}² = ?', 'квадратов',
+                          'Квадраты {first}–{last}'))
+
+# Наборы таблиц: диапазоны таблиц и множителей и виды примеров в каждой таблице
+PROBLEM_SPACES = {
+    'classic': {'tables': range(2, 10), 'factors': range(1, 10), 'kinds': ('mul', 'div')},
+    '12x12': {'tables': range(2, 13), 'factors': range(1, 13), 'kinds': ('mul', 'div')},
+    # Двузначное на однозначное: таблица - двузначное число
+    'two_digit': {'tables': range(10, 100), 'factors': range(2, 10), 'kinds': ('mul',)},
+    'squares': {'tables': range(1, 3), 'factors': range(1, 11), 'kinds': ('square',)},
+    'add_sub': {'tables': range(1, 11), 'factors': range(1, 11), 'kinds': ('add', 'sub')},
+}
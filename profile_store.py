@@ -0,0 +1,416 @@
+"""Профили учеников в SQLite.
+
+Каждый ученик на устройстве - отдельный профиль со своим состоянием
+TrainerEngine, статистикой по примерам, сессиями и историей ответов:
+
+    profiles    - имя, состояние движка (JSON без статистики), время использования
+    fact_stats  - строка на (профиль, пример), только для спрошенных примеров
+    sessions    - начало, конец, таблица, этап, число ответов в сессии
+    answers     - все ответы с метками времени
+
+База открывается в режиме WAL: запись не блокирует чтение, а фиксация
+транзакции не ждет fsync. Основной поток в базу не пишет: ответы, состояние,
+измененные строки статистики и отметки сессий копятся в памяти, а фоновый
+поток со своим соединением пишет их одной транзакцией раз в batch_size
+ответов (или max_delay секунд) - там же идут и контрольные точки WAL. Потерю
+хвоста при падении закрывает журнал событий профиля (event_log). Основной
+поток только читает: список профилей и загрузку профиля (после flush()).
+Выборки и обновления идут по индексам с профилем
+первым ключом, поэтому переключение профиля не зависит от числа ответов
+других учеников и остается быстрым после года использования.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from applog import get_logger
+from fact_stats import FactStats, FIELDS
+
+log = get_logger('profiles')
+
+SCHEMA_VERSION = 1
+
+STAT_COLUMNS = tuple(name for name, _ in FIELDS)
+STAT_TYPES = {'I': 'INTEGER', 'd': 'REAL'}
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT '{{}}'
+);
+CREATE INDEX IF NOT EXISTS profiles_last_used ON profiles(last_used);
+CREATE TABLE IF NOT EXISTS fact_stats (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    fact INTEGER NOT NULL,
+    {', '.join(f'{name} {STAT_TYPES[code]} NOT NULL DEFAULT 0' for name, code in FIELDS)},
+    PRIMARY KEY (profile_id, fact)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    started REAL NOT NULL,
+    ended REAL,
+    table_num INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_profile ON sessions(profile_id, started);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    session_id INTEGER,
+    timestamp REAL NOT NULL,
+    fact INTEGER NOT NULL,
+    answer INTEGER,
+    is_correct INTEGER NOT NULL,
+    timed_out INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    stage INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_profile ON answers(profile_id, timestamp);
+'''
+
+UPSERT_STATS = (f'INSERT OR REPLACE INTO fact_stats (profile_id, fact, {", ".join(STAT_COLUMNS)}) '
+                f'VALUES (?, ?, {", ".join("?" for _ in STAT_COLUMNS)})')
+INSERT_ANSWER = ('INSERT INTO answers (profile_id, session_id, timestamp, fact, answer, is_correct, '
+                 'timed_out, latency, stage) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+class WriterUnavailable(RuntimeError):
+    """Поток записи остановился с ошибкой или не ответил вовремя"""
+
+
+class ProfileStore:
+    """Профили, статистика и история ответов в одной базе SQLite"""
+
+    def __init__(self, path, batch_size=32, max_delay=3.0):
+        self.path = path
+        self.batch_size = batch_size  # Ответов в одной транзакции
+        self.max_delay = max_delay    # Но не дольше этого с первого незаписанного изменения
+        self.db = self._connect()     # Только для чтения в основном потоке
+        if self.db.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+        # Номера сессий раздаем сами, чтобы open_session не ждал вставки
+        self._next_session_id = self.db.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM sessions').fetchone()[0]
+        self._dirty_facts = set()  # Примеры с ответами после последнего save_state
+        self._cond = threading.Condition()
+        # Накопленное для следующей транзакции (под _cond)
+        self._ops = []       # (sql, параметры) по порядку: сессии, отметки профилей
+        self._answers = []   # Строки INSERT_ANSWER
+        self._stats = {}     # (профиль, пример) -> строка UPSERT_STATS
+        self._states = {}    # профиль -> состояние движка
+        self._jobs = []      # Записи, результата которых ждет основной поток (_call)
+        self._first_pending = 0.0
+        self._flush_requested = False
+        self._writing = False
+        self._failures = 0
+        self._writer_error = None  # Почему поток записи остановился (его перезапустит следующее изменение)
+        self._closed = False
+        self._thread = None
+        self.last_committed = None  # Последнее записанное состояние
+
+    def _connect(self):
+        # Транзакции открываем сами (BEGIN ... COMMIT)
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('PRAGMA foreign_keys=ON')
+        return db
+
+    # --- Профили --- #
+
+    def profiles(self):
+        """Список (id, имя) по имени"""
+        return self.db.execute('SELECT id, name FROM profiles ORDER BY name').fetchall()
+
+    def last_profile(self):
+        """Профиль, который использовали последним, или None"""
+        row = self.db.execute('SELECT id FROM profiles ORDER BY last_used DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def create_profile(self, name, state=None, stats=None):
+        """Создает профиль и возвращает его id (ValueError, если имя занято).
+
+        Ждет записи: профиль создается по нажатию в диалоге, и его id нужен сразу.
+        Если поток записи остановился или не ответил вовремя - WriterUnavailable.
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError('Пустое имя профиля')
+        now = time.time()
+        state_json = json.dumps(state or {}, separators=(',', ':'))
+        stat_rows = _stat_rows(None, stats, range(stats.size)) if stats is not None else []
+
+        def insert(db):
+            profile_id = db.execute('INSERT INTO profiles (name, created, last_used, state) VALUES (?, ?, ?, ?)',
+                                    (name, now, now, state_json)).lastrowid
+            db.executemany(UPSERT_STATS, [(profile_id,) + row[1:] for row in stat_rows])
+            return profile_id
+
+        try:
+            return self._call(insert)
+        except sqlite3.IntegrityError:
+            raise ValueError(f'Профиль "{name}" уже есть') from None
+
+    def load(self, profile_id):
+        """(состояние движка, FactStats) профиля; отмечает профиль как текущий"""
+        self.flush()
+        row = self.db.execute('SELECT state FROM profiles WHERE id = ?', (profile_id,)).fetchone()
+        if row is None:
+            raise KeyError(profile_id)
+        stats = FactStats()
+        for fact, *values in self.db.execute(
+                f'SELECT fact, {", ".join(STAT_COLUMNS)} FROM fact_stats WHERE profile_id = ?', (profile_id,)):
+            stats.set_row(fact, values)
+        self._enqueue_op('UPDATE profiles SET last_used = ? WHERE id = ?', (time.time(), profile_id))
+        state = json.loads(row[0])
+        self.last_committed = state
+        return state, stats
+
+    # --- Сессии --- #
+
+    def open_session(self, profile_id, table_num, stage, started=None):
+        session_id = self._next_session_id
+        self._next_session_id += 1
+        self._enqueue_op('INSERT INTO sessions (id, profile_id, started, table_num, stage) VALUES (?, ?, ?, ?, ?)',
+                         (session_id, profile_id, started if started is not None else time.time(), table_num, stage))
+        return session_id
+
+    def close_session(self, session_id, ended=None):
+        self._enqueue_op('UPDATE sessions SET ended = ? WHERE id = ?',
+                         (ended if ended is not None else time.time(), session_id))
+
+    # --- Запись ответов пачками --- #
+
+    def add_answer(self, profile_id, session_id, fact, answer, is_correct, timed_out, latency, stage,
+                   timestamp=None):
+        """Запоминает ответ; в базу он попадет со следующей пачкой"""
+        row = (profile_id, session_id, timestamp if timestamp is not None else time.time(),
+               fact, answer, int(is_correct), int(timed_out), latency, stage)
+        self._dirty_facts.add(fact)
+        with self._cond:
+            self._mark_pending()
+            self._answers.append(row)
+            if len(self._answers) >= self.batch_size:
+                self._cond.notify_all()
+
+    def save_state(self, profile_id, state, stats):
+        """Запоминает состояние профиля (словарь больше не должен меняться) и строки статистики
+        примеров с новыми ответами; запись - когда наберется пачка или выйдет max_delay"""
+        rows = _stat_rows(profile_id, stats, self._dirty_facts)
+        self._dirty_facts = set()
+        with self._cond:
+            self._mark_pending()
+            self._stats.update(((profile_id, row[1]), row) for row in rows)
+            self._states.pop(profile_id, None)  # Последним в словаре - последнее сохраненное
+            self._states[profile_id] = state
+
+    def _enqueue_op(self, sql, params):
+        with self._cond:
+            self._mark_pending()
+            self._ops.append((sql, params))
+
+    def _mark_pending(self):
+        if not self._has_pending():
+            self._first_pending = time.monotonic()
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _has_pending(self):
+        return bool(self._ops or self._answers or self._stats or self._states)
+
+    def flush(self, wait=True, timeout=5.0):
+        """Записывает накопленное сейчас; с wait - дожидается записи (или ошибки)"""
+        with self._cond:
+            if not self._has_pending() and not self._writing:
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            if not wait:
+                return
+            failures = self._failures
+            end = time.monotonic() + timeout
+            while (self._has_pending() or self._writing) and self._failures == failures and self._thread is not None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def _call(self, write, timeout=5.0):
+        """Выполняет write(соединение) отдельной транзакцией после накопленного; ждет результат.
+
+        WriterUnavailable, если поток записи остановился или не ответил за timeout.
+        """
+        job = _Job(write)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('ProfileStore закрыт')
+            self._mark_pending()
+            self._jobs.append(job)
+            end = time.monotonic() + timeout
+            while not job.done:
+                remaining = end - time.monotonic()
+                if remaining <= 0 or self._thread is None:
+                    if job in self._jobs:
+                        self._jobs.remove(job)  # Еще не взята - не выполнится
+                    if self._thread is None:
+                        raise WriterUnavailable(f'Поток записи остановлен: {self._writer_error}')
+                    raise WriterUnavailable(f'Поток записи не ответил за {timeout} с')
+                self._cond.wait(remaining)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    # --- Поток записи --- #
+
+    def _run(self):
+        try:
+            db = self._connect()
+            try:
+                self._loop(db)
+            finally:
+                db.close()
+        except Exception as e:
+            log.error('Поток записи профилей остановлен: %s', e)
+            with self._cond:
+                self._writer_error = e
+                self._thread = None  # Ждущие узнают об остановке; следующее изменение запустит поток заново
+                self._writing = False
+                self._cond.notify_all()
+
+    def _loop(self, db):
+        while True:
+            with self._cond:
+                while not self._has_pending() and not self._jobs and not self._closed:
+                    self._cond.wait()
+                # Копим пачку, пока не наберется, не выйдет срок или запись не попросят
+                while not (self._jobs or self._flush_requested or self._closed
+                           or len(self._answers) >= self.batch_size):
+                    remaining = self._first_pending + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._has_pending() and not self._jobs:
+                    return  # Закрыт, и писать больше нечего
+                batch = (self._ops, self._answers, self._stats, self._states)
+                jobs = self._jobs
+                self._ops, self._answers, self._stats, self._states, self._jobs = [], [], {}, {}, []
+                self._flush_requested = False
+                self._writing = True
+            written = self._write(db, *batch)
+            for job in jobs:
+                job.run(db)
+            with self._cond:
+                self._writing = False
+                if written:
+                    if batch[3]:
+                        self.last_committed = list(batch[3].values())[-1]
+                elif self._closed:
+                    log.error('Не записано при закрытии: ответов %s', len(batch[1]))
+                else:
+                    # Вернем пачку перед новыми изменениями и повторим через max_delay
+                    self._failures += 1
+                    self._restore(*batch)
+                self._cond.notify_all()
+
+    def _write(self, db, ops, answers, stats, states):
+        try:
+            with _Transaction(db):
+                for sql, params in ops:
+                    db.execute(sql, params)
+                db.executemany(INSERT_ANSWER, answers)
+                totals = {}
+                for row in answers:
+                    count, correct = totals.get(row[1], (0, 0))
+                    totals[row[1]] = (count + 1, correct + row[5])
+                db.executemany('UPDATE sessions SET answers = answers + ?, correct = correct + ? WHERE id = ?',
+                               [(count, correct, session_id) for session_id, (count, correct) in totals.items()
+                                if session_id is not None])
+                db.executemany(UPSERT_STATS, stats.values())
+                now = time.time()
+                db.executemany('UPDATE profiles SET state = ?, last_used = ? WHERE id = ?',
+                               [(json.dumps(state, separators=(',', ':')), now, profile_id)
+                                for profile_id, state in states.items()])
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            log.error('Ошибка записи профилей: %s', e)
+            return False
+        return True
+
+    def _restore(self, ops, answers, stats, states):
+        self._ops = ops + self._ops
+        self._answers = answers + self._answers
+        stats.update(self._stats)
+        self._stats = stats
+        for profile_id, state in self._states.items():
+            states.pop(profile_id, None)
+            states[profile_id] = state
+        self._states = states
+        self._first_pending = time.monotonic()
+
+    def close(self):
+        """Записывает все, останавливает поток записи и закрывает базу"""
+        if self.db is None:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=10.0)
+        self.db.close()
+        self.db = None
+
+
+def _stat_rows(profile_id, stats, facts):
+    """Строки UPSERT_STATS для спрошенных примеров из facts"""
+    return [(profile_id, fact) + stats.row(fact) for fact in facts if fact < stats.size and stats.attempts[fact]]
+
+
+class _Job:
+    """Запись из _call: результат или исключение для ждущего потока"""
+
+    def __init__(self, write):
+        self.write = write
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def run(self, db):
+        try:
+            with _Transaction(db):
+                self.result = self.write(db)
+        except Exception as e:
+            self.error = e
+        self.done = True
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, откат при исключении (и при ошибке самого COMMIT)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.db.execute('COMMIT')
+                return False
+            except sqlite3.Error:
+                if self.db.in_transaction:
+                    self.db.execute('ROLLBACK')
+                raise
+        if self.db.in_transaction:
+            self.db.execute('ROLLBACK')
+        return False
@@ -0,0 +1,34 @@
+"""Чтение прогресса в старом формате (progress.json).
+
+Раньше снимок прогресса писался в JSON-файл через временный файл с
+атомарным переименованием, а предыдущий удачный снимок оставался рядом
+(.bak). Теперь прогресс хранится в профилях (profile_store); этот модуль
+нужен только для однократного переноса старого файла.
+"""
+import json
+import os
+
+from applog import get_logger
+
+log = get_logger('progress')
+
+
+def load_progress(path):
+    """Читает снимок; при повреждении основного файла - резервный. None, если нет ни одного"""
+    for candidate in (path, path + '.bak'):
+        data = _read(candidate)
+        if data is not None:
+            return data
+    return None
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (IOError, ValueError):
+        log.warning('Файл прогресса %s поврежден', path)
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,157 @@
+"""Планировщики выбора следующего примера.
+
+Планировщик получает набор примеров, выдает следующий через pick() и
+учитывает исход каждого ответа через record(). Все реализации работают без
+полного просмотра примеров на каждом вопросе, поэтому подходят для тысяч
+примеров. У каждого ученика (TrainerEngine) свой экземпляр планировщика.
+
+LeitnerScheduler - коробки Лейтнера с очередью по сроку (heap). Время
+логическое: номер вопроса, поэтому поведение одинаково в симуляциях и в
+приложении. Ошибка или тайм-аут возвращает пример в первую коробку (скоро
+повторим), быстрый правильный ответ переносит в следующую, медленный
+правильный оставляет в текущей.
+"""
+import heapq
+
+# Оценка ответа
+GRADE_WRONG = 0  # Неверный ответ или тайм-аут
+GRADE_SLOW = 1   # Правильный, но медленный
+GRADE_GOOD = 2   # Правильный и быстрый
+
+# Через сколько вопросов повторять пример из коробки 0, 1, 2, ...
+LEITNER_INTERVALS = (2, 4, 8, 16, 32)
+
+
+class RandomScheduler:
+    """Равновероятный выбор (прежнее поведение random.choice)"""
+
+    kind = 'random'
+
+    def __init__(self, facts=()):
+        self.facts = []
+        self.positions = {}
+        for fact in facts:
+            self.add(fact)
+
+    def __len__(self):
+        return len(self.facts)
+
+    def __contains__(self, fact):
+        return fact in self.positions
+
+    def add(self, fact):
+        if fact not in self.positions:
+            self.positions[fact] = len(self.facts)
+            self.facts.append(fact)
+
+    def remove(self, fact):
+        i = self.positions.pop(fact, None)
+        if i is None:
+            return
+        last = self.facts.pop()
+        if last != fact:
+            self.facts[i] = last
+            self.positions[last] = i
+
+    def pick(self, rng):
+        if not self.facts:
+            return None
+        return self.facts[rng.randrange(len(self.facts))]
+
+    def record(self, fact, grade):
+        self.add(fact)
+
+    def snapshot(self):
+        return {'kind': self.kind, 'facts': list(self.facts)}
+
+    @classmethod
+    def from_snapshot(cls, data):
+        return cls(data.get('facts', ()))
+
+
+class LeitnerScheduler:
+    """Коробки Лейтнера с выбором примера с ближайшим сроком за O(log n)"""
+
+    kind = 'leitner'
+
+    def __init__(self, facts=(), intervals=LEITNER_INTERVALS):
+        self.intervals = intervals
+        self.step = 0      # Логическое время: число выданных вопросов
+        self.boxes = {}    # пример -> коробка
+        self.due = {}      # пример -> срок (шаг) действующей записи в очереди
+        self.heap = []     # (срок, порядковый номер, пример); устаревшие записи пропускаются
+        self._seq = 0
+        # Первый проход - в переданном порядке
+        for fact in facts:
+            self._schedule(fact, 0, self.step)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, fact):
+        return fact in self.boxes
+
+    def _schedule(self, fact, box, due):
+        self.boxes[fact] = box
+        self._seq += 1
+        self.due[fact] = (due, self._seq)
+        heapq.heappush(self.heap, (due, self._seq, fact))
+
+    def add(self, fact):
+        if fact not in self.boxes:
+            self._schedule(fact, 0, self.step)
+
+    def remove(self, fact):
+        # Запись в очереди станет устаревшей и будет пропущена
+        self.boxes.pop(fact, None)
+        self.due.pop(fact, None)
+
+    def pick(self, rng=None):
+        """Пример с ближайшим сроком (даже если срок еще не наступил)"""
+        heap = self.heap
+        while heap:
+            due, seq, fact = heap[0]
+            if self.due.get(fact) == (due, seq):
+                self.step += 1
+                return fact
+            heapq.heappop(heap)
+        return None
+
+    def record(self, fact, grade):
+        box = self.boxes.get(fact, 0)
+        if grade == GRADE_WRONG:
+            box = 0
+        elif grade == GRADE_GOOD:
+            box = min(box + 1, len(self.intervals) - 1)
+        self._schedule(fact, box, self.step + self.intervals[box])
+        # Очередь не должна разрастаться из устаревших записей
+        if len(self.heap) > 4 * len(self.boxes) + 16:
+            self._rebuild()
+
+    def _rebuild(self):
+        self.heap = [(due, seq, fact) for fact, (due, seq) in self.due.items()]
+        heapq.heapify(self.heap)
+
+    def snapshot(self):
+        return {'kind': self.kind, 'step': self.step,
+                'facts': [[fact, self.boxes[fact], due]
+                          for fact, (due, _) in sorted(self.due.items(), key=lambda item: item[1])]}
+
+    @classmethod
+    def from_snapshot(cls, data):
+        scheduler = cls()
+        scheduler.step = data.get('step', 0)
+        for fact, box, due in sorted(data.get('facts', ()), key=lambda item: item[2]):
+            scheduler._schedule(fact, box, due)
+        return scheduler
+
+
+SCHEDULERS = {cls.kind: cls for cls in (RandomScheduler, LeitnerScheduler)}
+
+
+def scheduler_from_snapshot(data):
+    """Восстанавливает планировщик по снимку или None, если снимок не подходит"""
+    if not data:
+        return None
+    cls = SCHEDULERS.get(data.get('kind'))
+    return cls.from_snapshot(data) if cls is not None else None
@@ -0,0 +1,157 @@
+"""Запись и воспроизведение сессий для воспроизводимых отчетов об ошибках.
+
+Запись - файл JSON Lines: первая строка - заголовок (seed генератора
+случайных чисел, набор таблиц и полное состояние движка на момент начала
+записи), дальше по строке на действие пользователя: время от начала записи
+в секундах, имя действия и значение, например
+
+    {"t": 3.412, "input": "digit", "value": "7"}
+
+Действия - те, что проходят через LearningScreen.handle_input: цифры,
+очистка, проверка (со временем ответа в секундах), тайм-аут, показ
+следующего вопроса, старт/стоп, настройки и кнопки диалогов. Все случайные
+выборы приложения делаются генераторами, созданными из seed, поэтому те же
+действия на том же состоянии дают ту же сессию.
+
+SessionReplayer подает действия обратно в экран - сразу одно за другим
+(для профилирования) или по одному, когда подошло их время (в записанном
+темпе; часы и ожидание задает вызывающий код, см. tools/replay_session.py).
+"""
+import json
+import os
+import time
+
+from applog import get_logger
+
+log = get_logger('recorder')
+
+RECORDING_VERSION = 2  # 2: проверка хранит время ответа в секундах (было - остаток таймера)
+# После этих действий запись сбрасывается на диск (остальные копятся в буфере файла)
+FLUSH_INPUTS = frozenset(('check', 'timeout', 'stop'))
+
+
+class SessionRecorder:
+    """Пишет заголовок и действия пользователя в файл записи"""
+
+    def __init__(self, path, seed, state, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.start = clock()
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        header = {'version': RECORDING_VERSION, 'seed': seed, 'created': time.time(),
+                  'problem_space': state.get('problem_space'), 'state': state}
+        self._file.write(json.dumps(header, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def record(self, name, value=None):
+        if self._file is None:
+            return
+        event = {'t': round(self.clock() - self.start, 3), 'input': name}
+        if value is not None:
+            event['value'] = value
+        try:
+            self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            if name in FLUSH_INPUTS:
+                self._file.flush()
+        except (IOError, OSError) as e:
+            log.error('Ошибка записи сессии: %s', e)
+            self.close()
+            return
+        self.count += 1
+
+    def flush(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except (IOError, OSError) as e:
+                log.error('Ошибка записи сессии: %s', e)
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except (IOError, OSError):
+                pass
+            self._file = None
+
+
+def load_recording(path):
+    """(заголовок, список действий) из файла записи; оборванная последняя строка пропускается"""
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if not lines:
+        raise ValueError(f'{path}: пустая запись')
+    header = json.loads(lines[0])
+    if header.get('version') != RECORDING_VERSION:
+        raise ValueError(f'{path}: неизвестная версия записи {header.get("version")}')
+    events = []
+    for number, line in enumerate(lines[1:], 2):
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            if number != len(lines):
+                raise ValueError(f'{path}: поврежденная строка {number}')
+    return header, events
+
+
+def prune_recordings(directory, keep):
+    """Оставляет в каталоге keep последних записей"""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.jsonl'))
+    except OSError:
+        return
+    for name in names[:-keep] if keep > 0 else names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            log.warning('Не удалось удалить запись %s: %s', name, e)
+
+
+class SessionReplayer:
+    """Подает записанные действия в экран через handle_input"""
+
+    def __init__(self, app, screen, header, events):
+        self.app = app
+        self.screen = screen
+        self.header = header
+        self.events = events
+        self.position = 0
+
+    def prepare(self):
+        """Состояние и генераторы - как в начале записи; запись и таймер экрана выключены"""
+        self.app.stop_recording()
+        self.screen.stop_session()
+        self.app.seed_rngs(self.header['seed'])
+        self.app.engine.restore(self.header['state'])
+        self.screen.replaying = True
+        self.screen.show_idle()
+
+    @property
+    def done(self):
+        return self.position >= len(self.events)
+
+    def next_time(self):
+        """Время следующего действия от начала записи (None, если действий не осталось)"""
+        return None if self.done else self.events[self.position]['t']
+
+    def step(self):
+        event = self.events[self.position]
+        self.position += 1
+        self.screen.handle_input(event['input'], event.get('value'))
+
+    def run_until(self, elapsed):
+        """Подает все действия со временем не позже elapsed; возвращает их число"""
+        count = 0
+        while not self.done and self.events[self.position]['t'] <= elapsed:
+            self.step()
+            count += 1
+        return count
+
+    def run(self):
+        """Все действия подряд без пауз"""
+        while not self.done:
+            self.step()
+
+    def finish(self):
+        self.screen.replaying = False
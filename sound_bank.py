@@ -0,0 +1,199 @@
+"""Звуковой банк: все клипы в одном файле и быстрое воспроизведение.
+
+Формат sounds.bank (little-endian):
+
+    заголовок: b'MTSB', версия u8, частота u32, число клипов u16
+    таблица:   для каждого клипа - имя (16 байт), группа (8 байт),
+               смещение PCM от начала данных u32, число сэмплов u32
+    данные:    PCM моно 16 бит всех клипов подряд
+
+Банк собирается из wav-файлов шагом сборки tools/pack_sounds.py (клипы
+обрезаются по тишине и нормализуются). При запуске банк отображается в память
+(mmap) одним файлом, короткие клипы держатся уже декодированными. На Android они
+играются через AudioTrack в статическом режиме (без декодера и файлов),
+на остальных платформах клипы один раз извлекаются в wav-кэш и проигрываются
+через SoundManager.
+"""
+import mmap
+import os
+import random
+import struct
+import wave
+
+from applog import get_logger
+
+log = get_logger('sound')
+
+MAGIC = b'MTSB'
+VERSION = 1
+HEADER = struct.Struct('<4sBIH')
+ENTRY = struct.Struct('<16s8sII')
+SAMPLE_WIDTH = 2
+
+SHORT_CLIP_SECONDS = 2.0  # Клипы не длиннее держим декодированными постоянно
+
+
+def write_bank(path, sample_rate, clips):
+    """Записывает банк. clips - список (имя, группа, PCM моно 16 бит в bytes)"""
+    table = []
+    offset = 0
+    for name, group, pcm in clips:
+        table.append(ENTRY.pack(name.encode('ascii'), (group or '').encode('ascii'),
+                                offset, len(pcm) // SAMPLE_WIDTH))
+        offset += len(pcm)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sample_rate, len(clips)))
+        f.writelines(table)
+        for _, _, pcm in clips:
+            f.write(pcm)
+
+
+class SoundBank:
+    """Банк клипов, отображенный в память"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.sample_rate, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: не звуковой банк')
+        self.path = path
+        self.clips = {}   # имя -> (группа, смещение, число сэмплов)
+        self.groups = {}  # группа -> список имен
+        pos = HEADER.size
+        for _ in range(count):
+            raw_name, raw_group, offset, samples = ENTRY.unpack_from(data, pos)
+            pos += ENTRY.size
+            name = raw_name.rstrip(b'\0').decode('ascii')
+            group = raw_group.rstrip(b'\0').decode('ascii') or None
+            self.clips[name] = (group, offset, samples)
+            if group:
+                self.groups.setdefault(group, []).append(name)
+        self._data = memoryview(data)[pos:]
+
+    def pcm(self, name):
+        """PCM клипа без копирования"""
+        _, offset, samples = self.clips[name]
+        return self._data[offset:offset + samples * SAMPLE_WIDTH]
+
+    def duration(self, name):
+        return self.clips[name][2] / self.sample_rate
+
+    def extract_wav(self, name, path):
+        """Сохраняет клип в wav-файл"""
+        with wave.open(path, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(SAMPLE_WIDTH)
+            w.setframerate(self.sample_rate)
+            w.writeframes(self.pcm(name))
+
+
+class AndroidClip:
+    """Клип в AudioTrack статического режима: PCM загружен один раз"""
+
+    def __init__(self, jni, sample_rate, pcm):
+        size = len(pcm)
+        self.track = jni.AudioTrack(jni.AudioManager.STREAM_MUSIC, sample_rate,
+                                    jni.AudioFormat.CHANNEL_OUT_MONO, jni.AudioFormat.ENCODING_PCM_16BIT,
+                                    size, jni.AudioTrack.MODE_STATIC)
+        self.track.write(bytearray(pcm), 0, size)
+
+    def play(self):
+        # Перематываем на начало и запускаем заново без повторной загрузки данных
+        self.track.stop()
+        self.track.reloadStaticData()
+        self.track.play()
+
+
+def load_android_audio():
+    """Классы android.media через pyjnius или None вне Android"""
+    try:
+        from jnius import autoclass
+        jni = type('AndroidAudio', (), {})()
+        jni.AudioTrack = autoclass('android.media.AudioTrack')
+        jni.AudioFormat = autoclass('android.media.AudioFormat')
+        jni.AudioManager = autoclass('android.media.AudioManager')
+        return jni
+    except Exception:
+        return None
+
+
+class SoundBankPlayer:
+    """Проигрыватель банка с интерфейсом SoundManager (play/play_random/preload)"""
+
+    def __init__(self, bank, cache_dir, max_loaded=6):
+        from sound_manager import SoundManager
+
+        self.bank = bank
+        self.groups = bank.groups
+        self.cache_dir = cache_dir
+        self.stamp = int(os.path.getmtime(bank.path))
+        self.jni = load_android_audio()
+        self.short_clips = {}  # имя -> AndroidClip
+        self.android_names = set()  # клипы, которые играются через AudioTrack
+        # Длинные клипы (и все клипы вне Android) идут через wav-кэш и SoundManager.
+        # Извлечение в кэш выполняется фоновым загрузчиком перед декодированием.
+        self.manager = SoundManager(max_loaded=max_loaded, loader=self.load_cached_wav)
+        for name, (group, _, _) in bank.clips.items():
+            short = bank.duration(name) <= SHORT_CLIP_SECONDS
+            if short and self.jni is not None:
+                self.android_names.add(name)
+                continue
+            self.manager.register(name, self.cached_wav_path(name), group=group, pinned=short,
+                                  check_exists=False)
+
+    def cached_wav_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}-{self.stamp}.wav')
+
+    def load_cached_wav(self, path):
+        """Загрузчик SoundManager: извлекает клип в кэш один раз на версию банка"""
+        from kivy.core.audio import SoundLoader
+
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            name = os.path.basename(path).rsplit('-', 1)[0]
+            tmp_path = path + '.tmp'
+            self.bank.extract_wav(name, tmp_path)
+            os.replace(tmp_path, path)
+        return SoundLoader.load(path)
+
+    def android_clip(self, name):
+        """Клип AudioTrack; PCM загружается в трек при первом обращении"""
+        clip = self.short_clips.get(name)
+        if clip is None:
+            try:
+                clip = AndroidClip(self.jni, self.bank.sample_rate, self.bank.pcm(name))
+            except Exception as e:
+                log.error('Ошибка подготовки звука %s: %s', name, e)
+                self.android_names.discard(name)
+                return None
+            self.short_clips[name] = clip
+        return clip
+
+    def preload(self, names):
+        """Короткие клипы готовятся заранее, остальные загружаются в фоне"""
+        for name in names:
+            if name in self.android_names:
+                self.android_clip(name)
+            else:
+                self.manager.request(name)
+
+    def play(self, name):
+        if name in self.android_names:
+            clip = self.android_clip(name)
+            if clip is not None:
+                clip.play()
+                return True
+            return False
+        return self.manager.play(name)
+
+    def play_random(self, group, rng=random):
+        names = self.groups.get(group)
+        if not names:
+            return False
+        if self.play(rng.choice(names)):
+            return True
+        loaded = [name for name in names if name in self.short_clips or name in self.manager.cache]
+        if loaded:
+            return self.play(rng.choice(loaded))
+        return False
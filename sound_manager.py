@@ -0,0 +1,146 @@
+"""Ленивая фоновая загрузка звуков с ограниченным кэшем.
+
+Звуки только регистрируются при создании экрана, а декодируются в фоновом
+потоке после первого кадра (preload) или при первом обращении. Пока звук не
+загружен, play() молча пропускает его (или играет уже загруженный вариант из
+той же группы). Загруженные звуки хранятся в LRU-кэше ограниченного размера,
+закрепленные (pinned) звуки из кэша не вытесняются.
+"""
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+
+from applog import get_logger
+
+log = get_logger('sound')
+
+
+def load_sound(path):
+    # Аудио-провайдер Kivy инициализируется при первой загрузке, а не при старте
+    from kivy.core.audio import SoundLoader
+    return SoundLoader.load(path)
+
+
+class SoundManager:
+    """Реестр звуков, фоновый загрузчик и LRU-кэш загруженных звуков"""
+
+    def __init__(self, max_loaded=6, loader=None):
+        self.max_loaded = max_loaded
+        self.loader = loader if loader is not None else load_sound
+        self.paths = {}       # имя -> путь к файлу
+        self.groups = {}      # группа -> список имен
+        self.pinned = set()   # имена, которые не вытесняются
+        self.cache = OrderedDict()  # имя -> Sound, в порядке использования
+        self.failed = set()   # файлы, которые не удалось загрузить
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._requests = deque()
+        self._requested = set()
+        self._done = deque()  # (имя, Sound или None) от фонового потока
+        self._thread = None
+
+    def register(self, name, path, group=None, pinned=False, check_exists=True):
+        """Регистрирует звук без загрузки"""
+        if check_exists and not os.path.exists(path):
+            return
+        self.paths[name] = path
+        if group is not None:
+            self.groups.setdefault(group, []).append(name)
+        if pinned:
+            self.pinned.add(name)
+
+    def preload(self, names):
+        """Ставит звуки в очередь фоновой загрузки"""
+        for name in names:
+            self.request(name)
+
+    def request(self, name):
+        if name not in self.paths or name in self.cache or name in self.failed:
+            return
+        with self._lock:
+            if name in self._requested:
+                return
+            self._requested.add(name)
+            self._requests.append(name)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sound-loader', daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._requests:
+                    self._wakeup.clear()
+                    continue
+                name = self._requests.popleft()
+            try:
+                sound = self.loader(self.paths[name])
+            except Exception as e:
+                log.error('Ошибка загрузки звука %s: %s', name, e)
+                sound = None
+            with self._lock:
+                self._done.append((name, sound))
+
+    def _collect(self):
+        """Забирает загруженные фоном звуки в кэш (в основном потоке)"""
+        if not self._done:
+            return
+        with self._lock:
+            done = list(self._done)
+            self._done.clear()
+            for name, _ in done:
+                self._requested.discard(name)
+        for name, sound in done:
+            if sound is None:
+                self.failed.add(name)
+                continue
+            self.cache[name] = sound
+        self._evict()
+
+    def _evict(self):
+        """Выгружает давно не использованные звуки сверх лимита"""
+        excess = len(self.cache) - self.max_loaded
+        if excess <= 0:
+            return
+        for name in list(self.cache):
+            if excess <= 0:
+                break
+            sound = self.cache[name]
+            if name in self.pinned or getattr(sound, 'state', 'stop') == 'play':
+                continue
+            del self.cache[name]
+            sound.unload()
+            excess -= 1
+
+    def get(self, name):
+        """Загруженный звук или None (тогда загрузка запрашивается в фоне)"""
+        self._collect()
+        sound = self.cache.get(name)
+        if sound is None:
+            self.request(name)
+            return None
+        self.cache.move_to_end(name)
+        return sound
+
+    def play(self, name):
+        """Воспроизводит звук, если он уже загружен. Возвращает True, если звук играет"""
+        sound = self.get(name)
+        if sound is None:
+            return False
+        sound.play()
+        return True
+
+    def play_random(self, group, rng=random):
+        """Воспроизводит случайный звук группы; если он еще не загружен - любой загруженный"""
+        names = self.groups.get(group)
+        if not names:
+            return False
+        if self.play(rng.choice(names)):
+            return True
+        loaded = [name for name in names if name in self.cache]
+        if loaded:
+            return self.play(rng.choice(loaded))
+        return False
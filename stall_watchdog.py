@@ -0,0 +1,131 @@
+"""Сторожевой поток для зависаний главного потока.
+
+Главный поток отмечается через tick() на каждом кадре Clock. Фоновый поток
+раз в interval проверяет, давно ли была отметка: если дольше budget, идет
+зависание, и поток снимает стек главного потока (sys._current_frames),
+подсчитывая одинаковые стеки. Когда отметки возобновляются, отчет о
+зависании (длительность, стеки по числу попаданий) дописывается в файл с
+ротацией. Счетчики всех зависаний копятся в profile - это профиль того, где
+главный поток проводит время, когда тормозит.
+
+Запись отчетов идет в фоновом потоке и не задерживает интерфейс.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from applog import get_logger
+
+log = get_logger('watchdog')
+
+MAX_DEPTH = 16       # Сколько верхних кадров стека учитывать
+REPORT_STACKS = 5    # Сколько самых частых стеков писать в отчет
+
+
+class Watchdog:
+    """Обнаружение зависаний главного потока со снятием стеков"""
+
+    def __init__(self, report_path, budget=0.05, interval=0.01, max_bytes=256 * 1024, backups=3):
+        self.report_path = report_path
+        self.budget = budget        # Допустимая пауза между кадрами, секунды
+        self.interval = interval    # Период проверки и снятия стека
+        self.max_bytes = max_bytes  # Размер файла отчетов до ротации
+        self.backups = backups      # Сколько старых файлов хранить (.1, .2, ...)
+        self.main_ident = threading.main_thread().ident
+        self.last_tick = time.monotonic()
+        self.paused = True
+        self.profile = Counter()  # Стек -> число снимков за все зависания
+        self.stall_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, *args):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+            self._thread.start()
+        self.resume()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def pause(self):
+        """Не считать зависанием (приложение свернуто, Clock не идет)"""
+        self.paused = True
+
+    def resume(self):
+        self.last_tick = time.monotonic()
+        self.paused = False
+
+    def tick(self, *args):
+        """Вызывается главным потоком на каждом кадре"""
+        self.last_tick = time.monotonic()
+
+    # --- Фоновый поток --- #
+
+    def _run(self):
+        stall_start = None
+        samples = Counter()
+        while not self._stop.wait(self.interval):
+            last_tick = self.last_tick
+            stalled = not self.paused and time.monotonic() - last_tick > self.budget
+            if stalled:
+                if stall_start is None:
+                    stall_start = last_tick
+                stack = self._sample()
+                if stack:
+                    samples[stack] += 1
+            elif stall_start is not None:
+                # Главный поток ожил - пишем отчет о зависании
+                if not self.paused:
+                    self._report(stall_start, last_tick - stall_start, samples)
+                stall_start = None
+                samples = Counter()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.main_ident)
+        if frame is None:
+            return None
+        # Обход кадров вместо traceback.extract_stack: без чтения исходников
+        # через linecache и без импорта traceback при старте
+        entries = []
+        while frame is not None and len(entries) < MAX_DEPTH:
+            code = frame.f_code
+            entries.append(f'{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}')
+            frame = frame.f_back
+        return tuple(reversed(entries))
+
+    def _report(self, start, duration, samples):
+        self.stall_count += 1
+        self.profile.update(samples)
+        total = sum(samples.values())
+        lines = [f'{time.strftime("%Y-%m-%d %H:%M:%S")} зависание {duration * 1000:.0f} мс, '
+                 f'снимков стека: {total}']
+        for stack, count in samples.most_common(REPORT_STACKS):
+            lines.append(f'  {count}/{total}:')
+            lines.extend(f'    {frame}' for frame in reversed(stack))
+        self._write('\n'.join(lines) + '\n\n')
+
+    def _write(self, text):
+        try:
+            if os.path.exists(self.report_path) and os.path.getsize(self.report_path) >= self.max_bytes:
+                self._rotate()
+            with open(self.report_path, 'a', encoding='utf-8') as f:
+                f.write(text)
+        except (IOError, OSError) as e:
+            log.error('Ошибка записи отчета о зависании: %s', e)
+
+    def _rotate(self):
+        # stalls.log -> stalls.log.1 -> ... -> stalls.log.<backups> (самый старый удаляется)
+        for i in range(self.backups - 1, 0, -1):
+            older = f'{self.report_path}.{i}'
+            if os.path.exists(older):
+                os.replace(older, f'{self.report_path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.report_path, f'{self.report_path}.1')
+        else:
+            os.remove(self.report_path)
@@ -0,0 +1,168 @@
+"""Кэш отрисованных текстов для часто меняющихся надписей экрана.
+
+Label при каждой смене text растеризует строку шрифтом заново - в основном
+потоке. Набор строк экрана мал: вопросы изучаемых таблиц, "Время: N" и
+несколько ответов обратной связи. TextTextureCache хранит их текстуры
+(ключ - строка, размер шрифта в пикселях и жирность) с вытеснением давно
+не показанных сверх лимита байт, а prewarm() заранее рисует нужные строки
+в свободное время - понемногу в каждом кадре, в пределах бюджета.
+Строки, которые должны быть под рукой всегда (таймер, ответы, вопросы
+текущей таблицы), закрепляются и не вытесняются; остальные рисуются
+заранее, только пока помещаются в лимит.
+
+CachedLabel - надпись, которая берет текстуру из кэша и только рисует ее
+прямоугольником по центру; цвет задается инструкцией Color и новой
+отрисовки текста не требует.
+"""
+import time
+from collections import OrderedDict
+
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.properties import BooleanProperty, ColorProperty, NumericProperty, StringProperty
+from kivy.uix.widget import Widget
+
+from tracing import TRACER
+
+PREWARM_BUDGET = 0.004  # Секунд отрисовки заранее на кадр
+
+
+def render_text(text, font_size, bold=False):
+    """Текстура строки шрифтом по умолчанию (как у Label)"""
+    from kivy.core.text import Label as CoreLabel
+    label = CoreLabel(text=text, font_size=font_size, bold=bold)
+    label.refresh()
+    return label.texture
+
+
+class TextTextureCache:
+    """LRU-кэш текстур строк, ограниченный по байтам"""
+
+    def __init__(self, max_bytes=16 * 2 ** 20, renderer=render_text, budget=PREWARM_BUDGET):
+        self.max_bytes = max_bytes
+        self.renderer = renderer
+        self.budget = budget
+        self.textures = OrderedDict()  # (строка, размер, жирный) -> текстура
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.pinned = set()  # Ключи, которые не вытесняются
+        self._optional = set()
+        self._queue = []
+        self._prewarm_event = Clock.create_trigger(self._prewarm_step, 0)
+
+    def get(self, text, font_size, bold=False):
+        key = (text, font_size, bold)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return texture
+        self.misses += 1
+        with TRACER.span('text_render'):
+            return self._render(key)
+
+    def _render(self, key, keep=None):
+        """Рисует строку и кладет ее в кэш, вытесняя давно не показанные.
+
+        Закрепленные строки не вытесняются. С keep (заранее рисуемые строки)
+        не вытесняются и строки из keep: если места без них не хватает,
+        текстура в кэш не кладется и возвращается None.
+        """
+        texture = self.renderer(*key)
+        if texture is None:
+            return None
+        size = texture_bytes(texture)
+        victims = []
+        free = self.max_bytes - self.bytes
+        for old_key, old in self.textures.items():
+            if free >= size:
+                break
+            if old_key in self.pinned or (keep is not None and old_key in keep):
+                continue
+            victims.append(old_key)
+            free += texture_bytes(old)
+        if free < size and keep is not None and key not in self.pinned:
+            return None
+        for old_key in victims:
+            self.bytes -= texture_bytes(self.textures.pop(old_key))
+        self.textures[key] = texture
+        self.bytes += size
+        return texture
+
+    def prewarm(self, pinned, optional=()):
+        """Заменяет очередь заранее рисуемых строк [(строка, размер, жирный)].
+
+        Строки pinned закрепляются (прошлые закрепленные открепляются) и
+        рисуются первыми. Строки optional рисуются по порядку, пока помещаются
+        без вытеснения закрепленных и уже нарисованных из optional - дальше
+        очередь обрывается.
+        """
+        self.pinned = set(pinned)
+        self._optional = set(optional)
+        self._queue = [key for key in (*pinned, *optional) if key not in self.textures]
+        self._queue.reverse()  # Берем с конца
+        if self._queue:
+            self._prewarm_event()
+
+    def _prewarm_step(self, dt):
+        deadline = time.perf_counter() + self.budget
+        with TRACER.span('text_prewarm'):
+            while self._queue and time.perf_counter() < deadline:
+                key = self._queue.pop()
+                if key not in self.textures and self._render(key, keep=self._optional) is None:
+                    self._queue.clear()  # Места больше нет - остальное нарисуется по требованию
+        if self._queue:
+            self._prewarm_event()
+
+
+def texture_bytes(texture):
+    return texture.width * texture.height * 4
+
+
+class CachedLabel(Widget):
+    """Надпись с текстурой из TextTextureCache (по центру виджета)"""
+
+    text = StringProperty('')
+    font_size = NumericProperty('15sp')
+    bold = BooleanProperty(False)
+    color = ColorProperty([1, 1, 1, 1])
+    background_color = ColorProperty([0, 0, 0, 0])  # Фон под текстом (прозрачный - без фона)
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+        with self.canvas.before:
+            self._background_color = Color(rgba=self.background_color)
+            self._background = Rectangle(pos=self.pos, size=self.size)
+        with self.canvas:
+            self._color = Color(rgba=self.color)
+            self._rect = Rectangle(size=(0, 0))
+        self.fbind('text', self._update_texture)
+        self.fbind('font_size', self._update_texture)
+        self.fbind('bold', self._update_texture)
+        self.fbind('color', self._update_color)
+        self.fbind('background_color', self._update_color)
+        self.fbind('pos', self._update_rect)
+        self.fbind('size', self._update_rect)
+        self._update_texture()
+
+    def text_key(self, text):
+        """Ключ кэша для строки с шрифтом этой надписи (для prewarm)"""
+        return (text, self.font_size, self.bold)
+
+    def _update_texture(self, *args):
+        texture = self.cache.get(self.text, self.font_size, self.bold) if self.text else None
+        self._rect.texture = texture
+        self._rect.size = texture.size if texture is not None else (0, 0)
+        self._update_rect()
+
+    def _update_color(self, *args):
+        self._color.rgba = self.color
+        self._background_color.rgba = self.background_color
+
+    def _update_rect(self, *args):
+        self._background.pos = self.pos
+        self._background.size = self.size
+        width, height = self._rect.size
+        self._rect.pos = (int(self.center_x - width / 2), int(self.center_y - height / 2))
@@ -0,0 +1,259 @@
+"""Бенчмарки горячих путей экрана без устройства и без окна.
+
+Kivy запускается с окном SDL2 в драйвере offscreen (программный GL через
+EGL, например Mesa llvmpipe - X-сервер не нужен) и без звука, приложение
+строится без главного цикла. Каждый путь экрана вызывается
+много раз; для каждого пишутся времена (среднее, p50, p95, максимум),
+выделения памяти по tracemalloc (отдельный проход, чтобы не искажать
+времена) и число виджетов до и после. Результат - JSON-файл.
+
+    python tools/bench_screen.py --output bench.json
+    python tools/bench_screen.py --compare bench.json --threshold 0.25
+
+В режиме сравнения код выхода 1, если p50 какого-либо пути вырос больше
+чем на threshold относительно базового файла.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Kivy без экрана и звука - до первого импорта kivy. Окно SDL2 в драйвере
+# offscreen дает настоящий контекст GL без X-сервера (текстуры текста и
+# атласа создаются как на устройстве); драйвер dummy контекста GL не дает.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONFIG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_LOG_MODE', 'MIXED')  # Не перехватывать stderr - трассировки ошибок видны
+os.environ.setdefault('KIVY_WINDOW', 'sdl2')
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('KCFG_GRAPHICS_MAXFPS', '0')  # Clock.tick() без ожидания кадра
+
+import kivy  # noqa: E402
+from kivy.app import App  # noqa: E402
+
+import learning_only  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+
+class BenchApp(learning_only.LearningApp):
+    """Приложение с данными во временном каталоге"""
+
+    RECORD_SESSIONS = False
+    FAST_START = False  # Замеры идут на полностью построенном экране
+
+    def __init__(self, data_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.data_dir = data_dir
+
+    @property
+    def user_data_dir(self):
+        return self.data_dir
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.children)
+
+
+def settle(screen):
+    """Отменяет отложенный переход к следующему вопросу (главный цикл не идет)"""
+    screen.next_question_event.cancel()
+
+
+def ensure_question(screen):
+    """Активная сессия с текущим вопросом без ответа (после изучения таблицы начинаем заново)"""
+    engine = screen.engine
+    if engine.session_active and not screen.answer_pending:
+        # Переход к вопросу после ответа отменен settle() - показываем сами
+        screen.show_current_question()
+    if not engine.session_active or engine.current_fact is None:
+        engine.stop_session()
+        engine.reset()
+        engine.start_session()
+        screen.show_current_question()
+
+
+def answer_text(screen, correct):
+    engine = screen.engine
+    answer = engine.index.answer(engine.current_fact)
+    return str(answer if correct else answer + 1)
+
+
+# --- Пути экрана: (подготовка, замеряемый вызов) --- #
+
+def bench_show_current_question(screen, i):
+    ensure_question(screen)
+    return screen.show_current_question
+
+
+def bench_check_answer(screen, i):
+    ensure_question(screen)
+    screen.set_answer(answer_text(screen, correct=i % 4 != 0))
+    return screen.check_answer
+
+
+def bench_update_progress_bars(screen, i):
+    ensure_question(screen)
+    return screen.update_progress_bars
+
+
+def bench_build_ui(screen, i):
+    screen.clear_widgets()
+    return screen.build_ui
+
+
+BENCHMARKS = [
+    ('show_current_question', bench_show_current_question, 2000),
+    ('check_answer', bench_check_answer, 2000),
+    ('update_progress_bars', bench_update_progress_bars, 5000),
+    ('build_ui', bench_build_ui, 100),
+]
+
+
+def run_benchmark(screen, prepare, iterations):
+    durations = []
+    for i in range(iterations):
+        call = prepare(screen, i)
+        start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - start)
+        settle(screen)
+    durations.sort()
+    return {
+        'iterations': iterations,
+        'total_s': sum(durations),
+        'mean_us': sum(durations) / iterations * 1e6,
+        'p50_us': percentile(durations, 0.5) * 1e6,
+        'p95_us': percentile(durations, 0.95) * 1e6,
+        'max_us': durations[-1] * 1e6,
+    }
+
+
+def measure_allocations(screen, prepare, iterations):
+    """Выделения за iterations вызовов: блоки, байты и пик (tracemalloc)"""
+    for i in range(min(iterations, 20)):  # Прогрев кэшей
+        prepare(screen, i)()
+        settle(screen)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base_current, _ = tracemalloc.get_traced_memory()
+    for i in range(iterations):
+        prepare(screen, i)()
+        settle(screen)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, 'filename')
+    return {
+        'alloc_iterations': iterations,
+        'retained_blocks': sum(stat.count_diff for stat in diff),
+        'retained_bytes': sum(stat.size_diff for stat in diff),
+        'peak_bytes': peak - base_current,
+    }
+
+
+def start_app():
+    """Строит приложение без главного цикла: (app, экран, функция очистки)"""
+    data_dir = tempfile.mkdtemp(prefix='mt_bench_')
+    cwd = os.getcwd()
+
+    def cleanup():
+        os.chdir(cwd)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    # Файлы приложения (звезды, звуки) - из корня, профиль и журналы - во временном каталоге
+    os.chdir(ROOT)
+    app = BenchApp(data_dir)
+    app.PROFILE_DB = os.path.join(data_dir, 'profiles.db')
+    app.EVENT_LOG_DIR = os.path.join(data_dir, 'events')
+    app.LEGACY_PROGRESS_FILE = os.path.join(data_dir, 'progress.json')
+    App._running_app = app
+    try:
+        app.root = app.build()  # Как в App.run(): on_first_frame берет экран из app.root
+    except Exception:
+        App._running_app = None
+        cleanup()
+        raise
+    return app, app.root.get_screen('learning'), cleanup
+
+
+def run_all(iterations_scale, only=None):
+    app, screen, cleanup = start_app()
+    try:
+        results = {}
+        for name, prepare, iterations in BENCHMARKS:
+            if only and name not in only:
+                continue
+            iterations = max(1, int(iterations * iterations_scale))
+            widgets_before = count_widgets(screen)
+            result = run_benchmark(screen, prepare, iterations)
+            result.update(measure_allocations(screen, prepare, max(1, iterations // 10)))
+            result['widgets_before'] = widgets_before
+            result['widgets_after'] = count_widgets(screen)
+            results[name] = result
+            print(f'{name:24s} p50 {result["p50_us"]:9.1f} мкс  p95 {result["p95_us"]:9.1f} мкс  '
+                  f'виджетов {widgets_before} -> {result["widgets_after"]}')
+        app.on_stop()
+    finally:
+        App._running_app = None
+        cleanup()
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'kivy': kivy.__version__,
+        'platform': platform.platform(),
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение p50 с базой; возвращает список регрессий"""
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            print(f'{name:24s} нет в базе')
+            continue
+        ratio = result['p50_us'] / base['p50_us'] if base['p50_us'] else 1.0
+        mark = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = '  РЕГРЕССИЯ'
+        print(f'{name:24s} {base["p50_us"]:9.1f} -> {result["p50_us"]:9.1f} мкс ({ratio - 1:+.0%}){mark}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='куда записать результаты (JSON)')
+    parser.add_argument('--compare', metavar='BASELINE', help='сравнить с сохраненными результатами')
+    parser.add_argument('--threshold', type=float, default=0.25, help='допустимый рост p50 (доля)')
+    parser.add_argument('--scale', type=float, default=1.0, help='множитель числа итераций')
+    parser.add_argument('--only', nargs='*', help='запустить только эти пути')
+    args = parser.parse_args()
+
+    results = run_all(args.scale, args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'Результаты записаны в {args.output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Сборка атласа интерфейса ui.atlas из png-изображений приложения.
+
+Изображения укладываются в один ряд с прозрачными полями (чтобы при
+масштабировании соседние области не подмешивались друг к другу) в файл
+ui-0.png, а ui.atlas описывает области в формате kivy.atlas: координаты
+x, y, ширина, высота от левого нижнего угла. Запуск из корня репозитория:
+
+    python tools/pack_atlas.py
+
+Атлас нужно пересобирать после изменения исходных png. Поддерживаются
+png 8 бит на канал без чересстрочности (RGB и RGBA) - этого достаточно
+для изображений приложения, и сборке не нужны PIL и Kivy.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ui_assets import ATLAS_FILE  # noqa: E402
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PADDING = 2  # Прозрачных пикселей вокруг каждой области
+
+# имя области, файл
+IMAGES = [
+    ('star_filled', 'star_filled.png'),
+    ('star_empty', 'star_empty.png'),
+]
+
+
+def read_png(path):
+    """(ширина, высота, строки пикселей RGBA сверху вниз)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f'{path}: не png')
+    pos = len(PNG_SIGNATURE)
+    idat = []
+    header = None
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif kind == b'IDAT':
+            idat.append(chunk)
+        elif kind == b'IEND':
+            break
+    width, height, depth, color_type, _, _, interlace = header
+    channels = {2: 3, 6: 4}.get(color_type)
+    if depth != 8 or channels is None or interlace:
+        raise ValueError(f'{path}: поддерживаются только RGB/RGBA 8 бит без чересстрочности')
+
+    raw = zlib.decompress(b''.join(idat))
+    stride = width * channels
+    rows = []
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        filter_type = raw[start]
+        row = bytearray(raw[start + 1:start + 1 + stride])
+        unfilter(row, previous, filter_type, channels)
+        rows.append(row)
+        previous = row
+    if channels == 3:
+        rows = [rgb_to_rgba(row) for row in rows]
+    return width, height, rows
+
+
+def unfilter(row, previous, filter_type, bpp):
+    """Снимает фильтр строки png на месте"""
+    if filter_type == 0:
+        return
+    for i in range(len(row)):
+        left = row[i - bpp] if i >= bpp else 0
+        up = previous[i]
+        if filter_type == 1:
+            row[i] = (row[i] + left) & 0xFF
+        elif filter_type == 2:
+            row[i] = (row[i] + up) & 0xFF
+        elif filter_type == 3:
+            row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+        elif filter_type == 4:
+            up_left = previous[i - bpp] if i >= bpp else 0
+            p = left + up - up_left
+            pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+            if pa <= pb and pa <= pc:
+                predictor = left
+            elif pb <= pc:
+                predictor = up
+            else:
+                predictor = up_left
+            row[i] = (row[i] + predictor) & 0xFF
+        else:
+            raise ValueError(f'неизвестный фильтр png {filter_type}')
+
+
+def rgb_to_rgba(row):
+    rgba = bytearray(len(row) // 3 * 4)
+    rgba[0::4] = row[0::3]
+    rgba[1::4] = row[1::3]
+    rgba[2::4] = row[2::3]
+    rgba[3::4] = b'\xff' * (len(row) // 3)
+    return rgba
+
+
+def write_png(path, width, height, rows):
+    def chunk(kind, payload):
+        return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+    raw = b''.join(b'\x00' + bytes(row) for row in rows)
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 9)))
+        f.write(chunk(b'IEND', b''))
+
+
+def pack(images, atlas_path):
+    """Укладывает изображения в ряд; пишет <атлас>-0.png и описание областей"""
+    loaded = [(name, read_png(path)) for name, path in images]
+    width = PADDING + sum(w + PADDING for _, (w, _, _) in loaded)
+    height = max(h for _, (_, h, _) in loaded) + 2 * PADDING
+    canvas = [bytearray(width * 4) for _ in range(height)]
+    regions = {}
+    x = PADDING
+    for name, (w, h, rows) in loaded:
+        for y, row in enumerate(rows):
+            canvas[PADDING + y][x * 4:(x + w) * 4] = row
+        # Kivy считает y от нижнего края текстуры
+        regions[name] = [x, height - PADDING - h, w, h]
+        x += w + PADDING
+
+    base = os.path.splitext(atlas_path)[0]
+    image_name = f'{os.path.basename(base)}-0.png'
+    write_png(os.path.join(os.path.dirname(atlas_path), image_name), width, height, canvas)
+    with open(atlas_path, 'w', encoding='utf-8') as f:
+        json.dump({image_name: regions}, f, sort_keys=True)
+    return image_name, width, height, regions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=os.path.join(ROOT, ATLAS_FILE))
+    args = parser.parse_args()
+
+    images = [(name, os.path.join(ROOT, path)) for name, path in IMAGES]
+    image_name, width, height, regions = pack(images, args.output)
+    print(f'{args.output}: {image_name} {width}x{height}, областей {len(regions)}')
+    for name, region in sorted(regions.items()):
+        print(f'  {name}: {region}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Сборка звукового банка sounds.bank из wav-файлов приложения.
+
+Каждый клип приводится к моно 16 бит 22050 Гц, обрезается по тишине в начале
+и конце и нормализуется по пиковой громкости. Запуск из корня репозитория:
+
+    python tools/pack_sounds.py
+
+Банк нужно пересобирать после изменения wav-файлов.
+"""
+import argparse
+import os
+import sys
+import wave
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sound_bank import write_bank  # noqa: E402
+
+SAMPLE_RATE = 22050
+SILENCE_THRESHOLD = 0.01  # Доля полной шкалы, ниже которой звук считается тишиной
+PAD_SECONDS = 0.005       # Запас по краям обрезки
+PEAK = 0.89               # Целевой пик после нормализации (около -1 dBFS)
+
+# имя клипа, группа, файл
+CLIPS = [('click', None, 'click.wav')]
+CLIPS += [(f'fail{i}', 'fail', f'fail{i}.wav') for i in range(1, 6)]
+CLIPS += [(f'good{i}', 'good', f'good{i}.wav') for i in range(1, 6)]
+
+
+def read_mono(path):
+    """Читает wav и возвращает (частота, сэмплы моно 16 бит)"""
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f'{path}: поддерживается только 16 бит')
+        channels = w.getnchannels()
+        rate = w.getframerate()
+        frames = array('h', w.readframes(w.getnframes()))
+    if sys.byteorder == 'big':
+        frames.byteswap()
+    if channels == 1:
+        return rate, frames
+    mono = array('h', bytes(2 * (len(frames) // channels)))
+    for i in range(len(mono)):
+        base = i * channels
+        mono[i] = sum(frames[base:base + channels]) // channels
+    return rate, mono
+
+
+def resample(samples, rate):
+    """Понижает частоту до SAMPLE_RATE (целое отношение, усреднение)"""
+    if rate == SAMPLE_RATE:
+        return samples
+    if rate % SAMPLE_RATE:
+        raise ValueError(f'неподдерживаемая частота {rate}')
+    step = rate // SAMPLE_RATE
+    out = array('h', bytes(2 * (len(samples) // step)))
+    for i in range(len(out)):
+        base = i * step
+        out[i] = sum(samples[base:base + step]) // step
+    return out
+
+
+def trim(samples):
+    """Обрезает тишину в начале и в конце"""
+    threshold = int(32767 * SILENCE_THRESHOLD)
+    start = 0
+    while start < len(samples) and abs(samples[start]) <= threshold:
+        start += 1
+    end = len(samples)
+    while end > start and abs(samples[end - 1]) <= threshold:
+        end -= 1
+    pad = int(SAMPLE_RATE * PAD_SECONDS)
+    return samples[max(0, start - pad):min(len(samples), end + pad)]
+
+
+def normalize(samples):
+    peak = max((abs(s) for s in samples), default=0)
+    if peak == 0:
+        return samples
+    gain = PEAK * 32767 / peak
+    return array('h', (max(-32768, min(32767, int(s * gain))) for s in samples))
+
+
+def pack(source_dir, output):
+    clips = []
+    for name, group, filename in CLIPS:
+        path = os.path.join(source_dir, filename)
+        if not os.path.exists(path):
+            print(f'Пропускаем {filename}: файл не найден')
+            continue
+        rate, samples = read_mono(path)
+        samples = normalize(trim(resample(samples, rate)))
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        clips.append((name, group, samples.tobytes()))
+        print(f'{filename}: {len(samples) / SAMPLE_RATE:.2f} с')
+    write_bank(output, SAMPLE_RATE, clips)
+    print(f'Записан {output}: {len(clips)} клипов, {os.path.getsize(output)} байт')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=ROOT, help='каталог с wav-файлами')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'sounds.bank'))
+    args = parser.parse_args()
+    pack(args.source, args.output)
+
+
+if __name__ == '__main__':
+    main()
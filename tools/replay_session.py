@@ -0,0 +1,79 @@
+"""Воспроизведение записанной сессии на экране без окна (как в bench_screen).
+
+Запись берется из каталога recordings в данных приложения (пишется
+LearningApp, см. session_recorder). Состояние движка и seed - из заголовка
+записи, профиль - временный, настоящие данные не меняются. По умолчанию
+действия подаются подряд без пауз; с --realtime - в записанном темпе, с
+работающим Clock (звуки, диалоги, анимации срабатывают как на устройстве).
+С --trace включается трассировка, и трасса сохраняется в формате Chrome.
+
+    python tools/replay_session.py recordings/20260101-120000-1.jsonl
+    python tools/replay_session.py session.jsonl --realtime --trace trace.json
+"""
+import argparse
+import time
+
+import bench_screen  # Настраивает Kivy без окна; путь к корню репозитория
+
+from kivy.app import App
+from kivy.clock import Clock
+
+from session_recorder import SessionReplayer, load_recording
+from tracing import TRACER
+
+TICK = 0.01  # Шаг Clock при воспроизведении в записанном темпе
+
+
+def replay_realtime(replayer):
+    start = time.monotonic()
+    while not replayer.done:
+        replayer.run_until(time.monotonic() - start)
+        Clock.tick()
+        next_time = replayer.next_time()
+        if next_time is not None:
+            time.sleep(max(0.0, min(TICK, next_time - (time.monotonic() - start))))
+
+
+def replay_fast(replayer):
+    while not replayer.done:
+        replayer.step()
+        if replayer.position % 50 == 0:
+            Clock.tick()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording', help='файл записи (.jsonl)')
+    parser.add_argument('--realtime', action='store_true', help='в записанном темпе')
+    parser.add_argument('--trace', metavar='PATH', help='сохранить трассу (Chrome Trace Event)')
+    args = parser.parse_args()
+
+    header, events = load_recording(args.recording)
+    bench_screen.BenchApp.PROBLEM_SPACE = header.get('problem_space') or 'classic'
+    bench_screen.BenchApp.PERF_HUD = bool(args.trace)
+    app, screen, cleanup = bench_screen.start_app()
+    try:
+        replayer = SessionReplayer(app, screen, header, events)
+        replayer.prepare()
+        start = time.perf_counter()
+        if args.realtime:
+            replay_realtime(replayer)
+        else:
+            replay_fast(replayer)
+        elapsed = time.perf_counter() - start
+        replayer.finish()
+        engine = app.engine
+        print(f'Действий: {len(events)} за {elapsed:.2f} с (запись {events[-1]["t"] if events else 0:.1f} с)')
+        print(f'Итог: таблица {engine.current_learning_table}, этап {engine.current_stage}, '
+              f'очки {engine.current_score}, изучено {engine.mastery_progress()[0]}')
+        if args.trace:
+            TRACER.export(args.trace)
+            print(f'Трасса записана в {args.trace}')
+        app.on_stop()
+    finally:
+        App._running_app = None
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Длительный прогон экрана для поиска утечек (виджеты, события Clock, память).
+
+Экран (Kivy без окна, как в bench_screen) проходит десятки тысяч вопросов:
+верные и неверные ответы, тайм-ауты, переходы этапов и таблиц, случайные
+остановки сессии и открытия настроек. Всплывающие окна "нажимаются" сразу.
+Каждые --sample-every вопросов снимаются RSS процесса, число объектов по
+типам (после gc.collect), число запланированных событий Clock и размер
+дерева виджетов. После прогрева рост каждого показателя должен оставаться
+ограниченным; иначе код выхода 1 и список растущих показателей.
+
+    python tools/soak_screen.py --questions 20000 --output soak.json
+"""
+import argparse
+import gc
+import json
+import random
+import resource
+import sys
+import time
+from collections import Counter
+
+import bench_screen  # Настраивает Kivy без окна; путь к корню репозитория
+
+from kivy.app import App
+from kivy.clock import Clock
+
+# Допустимый рост после прогрева
+WIDGET_SLACK = 5           # Виджетов в дереве экрана
+CLOCK_SLACK = 5            # Запланированных событий Clock
+OBJECT_SLACK = 500         # Объектов одного типа (при монотонном росте)
+RSS_SLACK_MB = 16          # Резидентной памяти
+WARMUP_FRACTION = 0.2      # Доля первых замеров, которые не учитываются
+
+# Вероятности действий: (верно, неверно) для этапов, остальное - тайм-аут
+ANSWER_ODDS = {1: (0.80, 0.15), 2: (0.97, 0.02)}
+STOP_START_ODDS = 0.03
+SETTINGS_ODDS = 0.01
+
+
+def rss_mb():
+    """Текущая резидентная память (Linux), иначе пиковая"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except (IOError, OSError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def sample(screen, questions):
+    gc.collect()
+    types = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {
+        'questions': questions,
+        'time': time.monotonic(),
+        'rss_mb': rss_mb(),
+        'clock_events': len(Clock.get_events()),
+        'widgets': bench_screen.count_widgets(screen),
+        'objects': dict(types),
+    }
+
+
+def press_dialogs(screen):
+    """Закрывает открытые диалоги так, как это сделал бы ребенок: основной кнопкой"""
+    for kind, dialog in list(screen.popups.dialogs.items()):
+        if kind == 'settings':
+            if dialog._on_save_callback is not None:
+                dialog._on_save(None)
+            continue
+        if not getattr(dialog, 'is_open', False):
+            continue
+        if dialog.button is not None and dialog._on_action_callback is not None:
+            dialog._on_action(None)
+        else:
+            dialog.dismiss()
+        if dialog.is_open:
+            # Без окна popup не открывался - закрытие доводим сами
+            dialog._on_dismiss(None)
+
+
+def fire_next_question(screen):
+    """Срабатывание отложенного перехода к вопросу без ожидания секунды"""
+    if screen.next_question_event.is_triggered:
+        screen.next_question_event.cancel()
+        screen.show_current_question()
+
+
+def step(screen, rng):
+    engine = screen.engine
+    if engine.session_active and engine.current_fact is None:
+        # Этап или таблица завершены - диалог уже показан
+        press_dialogs(screen)
+    if not engine.session_active:
+        screen.start_session(None)
+
+    r = rng.random()
+    if r < STOP_START_ODDS:
+        screen.stop_session()
+        screen.start_session(None)
+        return
+    if r < STOP_START_ODDS + SETTINGS_ODDS:
+        screen.open_settings_popup(None)
+        screen.popups.dialog('settings').slider.value = rng.randint(5, 8)
+        press_dialogs(screen)
+        screen.start_session(None)
+        return
+
+    if engine.current_fact is None:
+        return
+    correct_odds, wrong_odds = ANSWER_ODDS[engine.current_stage]
+    r = rng.random()
+    if r < correct_odds + wrong_odds:
+        answer = engine.index.answer(engine.current_fact)
+        screen.set_answer(str(answer if r < correct_odds else answer + 1))
+        screen.check_answer()
+    else:
+        screen.handle_timeout()
+    press_dialogs(screen)
+    fire_next_question(screen)
+    press_dialogs(screen)
+
+
+def growth(samples):
+    """Показатели, рост которых после прогрева не ограничен"""
+    start = samples[int(len(samples) * WARMUP_FRACTION)]
+    tail = samples[int(len(samples) * WARMUP_FRACTION):]
+    last = samples[-1]
+    problems = []
+    if last['widgets'] - start['widgets'] > WIDGET_SLACK:
+        problems.append(f'виджеты: {start["widgets"]} -> {last["widgets"]}')
+    if last['clock_events'] - start['clock_events'] > CLOCK_SLACK:
+        problems.append(f'события Clock: {start["clock_events"]} -> {last["clock_events"]}')
+    if last['rss_mb'] - start['rss_mb'] > RSS_SLACK_MB:
+        problems.append(f'RSS: {start["rss_mb"]:.1f} -> {last["rss_mb"]:.1f} МБ')
+    for name, count in last['objects'].items():
+        first = start['objects'].get(name, 0)
+        if count - first <= OBJECT_SLACK:
+            continue
+        counts = [s['objects'].get(name, 0) for s in tail]
+        if all(b >= a for a, b in zip(counts, counts[1:])):
+            problems.append(f'объекты {name}: {first} -> {count}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--sample-every', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='куда записать замеры (JSON)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app, screen, cleanup = bench_screen.start_app()
+    try:
+        samples = [sample(screen, 0)]
+        for question in range(1, args.questions + 1):
+            step(screen, rng)
+            if question % 50 == 0:
+                Clock.tick()
+            if question % args.sample_every == 0:
+                samples.append(sample(screen, question))
+                last = samples[-1]
+                print(f'{question:7d} RSS {last["rss_mb"]:7.1f} МБ  Clock {last["clock_events"]:4d}  '
+                      f'виджетов {last["widgets"]:4d}  объектов {sum(last["objects"].values())}')
+        app.on_stop()
+    finally:
+        App._running_app = None
+        cleanup()
+
+    problems = growth(samples) if len(samples) > 2 else []
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'questions': args.questions, 'seed': args.seed, 'problems': problems,
+                       'samples': samples}, f, ensure_ascii=False)
+    if problems:
+        print('Неограниченный рост:')
+        for problem in problems:
+            print(f'  {problem}')
+        sys.exit(1)
+    print('Рост ограничен')
+
+
+if __name__ == '__main__':
+    main()
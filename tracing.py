@@ -0,0 +1,169 @@
+"""Легкая трассировка горячих путей приложения.
+
+Интервалы (span) записываются в кольцевой буфер фиксированного размера:
+имя, начало и длительность по монотонным часам (perf_counter_ns) и поток.
+Пока трассировка выключена, span и traced почти ничего не стоят, поэтому
+разметка остается в коде и в сборке для устройства.
+
+По буферу считаются p50/p95 для каждого интервала и времени кадра (для
+отладочного оверлея perf_hud), а export() сохраняет его в формате Chrome
+Trace Event, который открывают chrome://tracing и ui.perfetto.dev.
+"""
+import functools
+import json
+import os
+import threading
+from array import array
+from time import perf_counter_ns
+
+from applog import get_logger
+
+log = get_logger('tracing')
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.name, self.start, perf_counter_ns())
+        return False
+
+
+def percentile(sorted_values, p):
+    """Перцентиль p (0..1) отсортированного списка (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+class Tracer:
+    """Кольцевой буфер интервалов и времен кадров"""
+
+    def __init__(self, capacity=4096, frame_capacity=240, enabled=False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.origin = perf_counter_ns()  # Ноль шкалы времени в экспорте
+        # Буфер интервалов: параллельные массивы, индекс - count % capacity
+        self.names = [None] * capacity
+        self.starts = array('q', bytes(8 * capacity))
+        self.durations = array('q', bytes(8 * capacity))
+        self.threads = [0] * capacity
+        self.count = 0
+        self.frame_times = array('d', bytes(8 * frame_capacity))  # Секунды
+        self.frame_count = 0
+        self._lock = threading.Lock()
+
+    # --- Запись --- #
+
+    def span(self, name):
+        """Контекстный менеджер интервала: with TRACER.span('save'): ..."""
+        return _Span(self, name) if self.enabled else NULL_SPAN
+
+    def traced(self, name):
+        """Декоратор: каждый вызов функции - интервал name"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, start, perf_counter_ns())
+            return wrapper
+        return decorate
+
+    def begin(self):
+        """Начало интервала, который закончится в другом вызове (см. end)"""
+        return perf_counter_ns() if self.enabled else None
+
+    def end(self, name, start):
+        if start is not None and self.enabled:
+            self.record(name, start, perf_counter_ns())
+
+    def record(self, name, start, end):
+        with self._lock:
+            i = self.count % self.capacity
+            self.names[i] = name
+            self.starts[i] = start
+            self.durations[i] = end - start
+            self.threads[i] = threading.get_ident()
+            self.count += 1
+
+    def frame(self, dt):
+        """Время кадра в секундах (вызывается каждый кадр)"""
+        if self.enabled:
+            self.frame_times[self.frame_count % len(self.frame_times)] = dt
+            self.frame_count += 1
+
+    # --- Статистика --- #
+
+    def _filled(self):
+        return min(self.count, self.capacity)
+
+    def span_stats(self):
+        """{имя: (число, p50 мс, p95 мс)} по интервалам в буфере"""
+        with self._lock:
+            n = self._filled()
+            durations = {}
+            for i in range(n):
+                durations.setdefault(self.names[i], []).append(self.durations[i])
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = (len(values), percentile(values, 0.5) / 1e6, percentile(values, 0.95) / 1e6)
+        return stats
+
+    def frame_stats(self):
+        """(p50 мс, p95 мс) времени кадра"""
+        values = sorted(self.frame_times[:min(self.frame_count, len(self.frame_times))])
+        return percentile(values, 0.5) * 1000, percentile(values, 0.95) * 1000
+
+    # --- Экспорт --- #
+
+    def chrome_trace(self):
+        """Содержимое буфера в формате Chrome Trace Event (время в микросекундах)"""
+        with self._lock:
+            n = self._filled()
+            first = self.count - n
+            order = [(first + k) % self.capacity for k in range(n)]
+            events = [{'name': self.names[i], 'ph': 'X', 'pid': os.getpid(), 'tid': self.threads[i],
+                       'ts': (self.starts[i] - self.origin) / 1000, 'dur': self.durations[i] / 1000}
+                      for i in order]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        """Записывает трассу в path (через временный файл)"""
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.chrome_trace(), f)
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            log.error('Ошибка записи трассы: %s', e)
+
+
+# Общий трассировщик приложения (включается в LearningApp)
+TRACER = Tracer()
@@ -0,0 +1,339 @@
+"""Логика тренировки без зависимости от Kivy.
+
+TrainerEngine хранит всё состояние сессии (этап, очки, счетчики изучения,
+мотивационные счетчики) и принимает решения по ответам. Экран только
+показывает результат, поэтому движок можно гонять в симуляциях и нагрузочных
+тестах без виджетов, звуков и Clock.
+"""
+import random
+from collections import namedtuple
+
+from alias_table import AliasTable
+from fact_index import FACT_INDEX
+from mastery import MasteryTracker
+from fact_stats import FactStats
+from scheduler import LeitnerScheduler, scheduler_from_snapshot, GRADE_WRONG, GRADE_SLOW, GRADE_GOOD
+
+DEFAULT_TIME_LIMIT = 7
+TARGET_SCORE = 150  # Очки для завершения второго этапа
+CORRECT_NEEDED = 5  # Правильных ответов подряд для изучения примера
+
+# Очки второго этапа
+SCORE_CORRECT = 1
+PENALTY_WRONG = 15
+PENALTY_TIMEOUT = 10
+
+FAST_ANSWER_TIME = 3  # Быстрый ответ (секунд)
+STREAK_TRIGGER = 25   # Серия правильных ответов для мотивационного сообщения
+
+# Веса примеров во втором этапе: чаще спрашиваем то, в чем ошибаются или думают долго
+WEIGHT_BASE = 1.0
+WEIGHT_UNSEEN = 2.0   # Пример еще ни разу не спрашивали
+WEIGHT_ERROR = 4.0    # Добавка за долю ошибок
+WEIGHT_SLOW = 2.0     # Добавка за время ответа (доля от лимита времени)
+MARATHON_REBUILD_EVERY = 16  # Ответов между пересборками таблицы выбора
+
+# Что мешает показать следующий вопрос
+MASTERY_COMPLETE = 'mastery_complete'  # Все примеры первого этапа изучены
+TABLE_COMPLETE = 'table_complete'      # Набраны очки второго этапа
+
+# Мотивационные триггеры
+TRIGGER_STREAK = 'streak'
+TRIGGER_HALF = 'half'
+
+# Результат ответа или тайм-аута
+AnswerResult = namedtuple('AnswerResult', 'fact stage answer is_correct correct_answer answer_time timed_out triggers')
+NO_TRIGGERS = ()
+
+
+class TrainerEngine:
+    """Машина состояний тренировки: вопросы, ответы, этапы и таблицы.
+
+    Примеры обозначаются номерами в FactIndex (self.index). Порядок вопросов
+    первого этапа задает планировщик (scheduler_factory, по умолчанию
+    коробки Лейтнера).
+    """
+
+    def __init__(self, rng=None, index=FACT_INDEX, scheduler_factory=LeitnerScheduler):
+        # Источник случайности: модуль random или random.Random(seed)
+        self.rng = rng if rng is not None else random
+        self.index = index
+        self.scheduler_factory = scheduler_factory
+        self.stats = FactStats()  # История ответов по примерам (не сбрасывается reset)
+        self.target_score = TARGET_SCORE
+        self.reset()
+        self.time_limit = DEFAULT_TIME_LIMIT
+
+    def reset(self):
+        """Сбрасывает прогресс обучения к первой таблице (время ответа сохраняется)"""
+        self.current_learning_table = self.index.first_table
+        self.current_score = 0
+        self.current_stage = 1  # 1 = mastery stage, 2 = score stage
+        self.mastery = MasteryTracker(correct_needed=CORRECT_NEEDED)  # Изучение текущей таблицы
+        self.scheduler = self.scheduler_factory()  # Очередь неизученных примеров
+        self.current_fact = None
+        self.session_active = False
+        self.pending = None
+        self.drop_marathon_sampler()
+        self.reset_triggers()
+
+    def reset_triggers(self):
+        # Счетчики для мотивационных триггеров
+        self.correct_streak = 0  # Серия правильных ответов подряд
+        self.fast_answers = 0    # Количество быстрых ответов подряд
+        self.session_correct = 0 # Правильных ответов в текущей сессии
+        self.shown_50 = False    # Сообщение о половине уже показано
+
+    # --- Сессия --- #
+
+    def start_session(self):
+        """Начинает сессию. Возвращает False, если сессия уже идет"""
+        if self.session_active:
+            return False
+        self.session_active = True
+        self.current_fact = None
+        self.pending = None
+        self.reset_triggers()
+
+        if self.current_stage == 1:
+            # Stage 1: Mastery of current table examples
+            start, end = self.index.table_range(self.current_learning_table)
+            # Счетчики изучения текущей таблицы сохраняются между сессиями
+            if self.mastery.start != start or len(self.mastery) != end - start:
+                facts = list(range(start, end))
+                self.rng.shuffle(facts)
+                self.mastery = MasteryTracker(start, facts, CORRECT_NEEDED)
+                self.scheduler = self.scheduler_factory(facts)
+            self.current_score = 0  # Reset score for stage 1
+        return True
+
+    def stop_session(self):
+        """Останавливает сессию. Возвращает False, если сессия не шла"""
+        if not self.session_active:
+            return False
+        self.session_active = False
+        return True
+
+    def next_question(self):
+        """Выбирает следующий пример.
+
+        Возвращает None, если этап завершен; причина остается в self.pending.
+        """
+        self.current_fact = None
+        if self.current_stage == 1:
+            # Stage 1: Mastery stage
+            fact = self.scheduler.pick(self.rng)
+            if fact is None:
+                # All examples mastered, move to stage 2
+                self.pending = MASTERY_COMPLETE
+                return None
+            self.current_fact = fact
+        else:
+            # Stage 2: Score accumulation stage
+            if self.current_score >= self.target_score:
+                self.pending = TABLE_COMPLETE
+                return None
+            # Choose examples from current and previous tables, weak ones more often
+            self.current_fact = self.marathon_sampler().sample(self.rng)
+        self.pending = None
+        return self.current_fact
+
+    def submit(self, answer, elapsed):
+        """Принимает ответ на текущий пример. Возвращает AnswerResult или None"""
+        fact = self.current_fact
+        if fact is None or not self.session_active:
+            return None
+        expected = self.index.answer(fact)
+        is_correct = answer == expected
+        triggers = self.apply_answer(fact, is_correct, False, elapsed)
+        return AnswerResult(fact, self.current_stage, answer, is_correct, expected, elapsed, False, triggers)
+
+    def timeout(self):
+        """Время на ответ вышло. Возвращает AnswerResult или None"""
+        fact = self.current_fact
+        if fact is None or not self.session_active:
+            return None
+        self.apply_answer(fact, False, True, self.time_limit)
+        return AnswerResult(fact, self.current_stage, None, False, self.index.answer(fact),
+                            self.time_limit, True, NO_TRIGGERS)
+
+    def apply_answer(self, fact, is_correct, timed_out, elapsed, timestamp=None):
+        """Применяет исход ответа к состоянию (также при воспроизведении журнала)"""
+        self.stats.record(fact, is_correct, timed_out, elapsed, timestamp)
+        if self.current_stage == 1:
+            if not self.mastery.contains(fact):
+                # Пример не из изучаемой таблицы (например, устаревшее событие журнала)
+                return NO_TRIGGERS
+            # Stage 1: Increment or reset consecutive correct count
+            self.mastery.record(fact, is_correct)
+            if self.mastery.is_mastered(fact):
+                self.scheduler.remove(fact)
+            elif not is_correct:
+                self.scheduler.record(fact, GRADE_WRONG)
+            elif elapsed <= FAST_ANSWER_TIME:
+                self.scheduler.record(fact, GRADE_GOOD)
+            else:
+                self.scheduler.record(fact, GRADE_SLOW)
+        else:
+            # Stage 2: обновляем вес примера, таблица выбора пересоберется позже
+            weights = self.marathon_weights
+            if weights is not None and fact < len(weights):
+                weights[fact] = self.fact_weight(fact)
+                self.marathon_changes += 1
+            if is_correct:
+                self.current_score += SCORE_CORRECT
+            elif timed_out:
+                # Stage 2: Deduct points for timeout
+                self.current_score = max(0, self.current_score - PENALTY_TIMEOUT)
+            else:
+                # Stage 2: Deduct points for incorrect answer
+                self.current_score = max(0, self.current_score - PENALTY_WRONG)
+
+        return self.check_motivational_triggers(is_correct, elapsed)
+
+    def check_motivational_triggers(self, is_correct, answer_time):
+        """Обновляет мотивационные счетчики и возвращает сработавшие триггеры"""
+        if not is_correct:
+            self.correct_streak = 0
+            self.fast_answers = 0
+            return NO_TRIGGERS
+
+        self.correct_streak += 1
+        self.session_correct += 1
+
+        # Быстрый ответ (меньше 3 секунд)
+        if answer_time <= FAST_ANSWER_TIME:
+            self.fast_answers += 1
+        else:
+            self.fast_answers = 0
+
+        # Мотивационные сообщения только в первом этапе (изучение)
+        if self.current_stage != 1:
+            return NO_TRIGGERS
+
+        triggers = NO_TRIGGERS
+        # Триггер 1: Серия из 25 правильных ответов подряд
+        if self.correct_streak == STREAK_TRIGGER:
+            triggers = (TRIGGER_STREAK,)
+
+        # Триггер 2: Половина примеров изучена
+        mastered_count, total_examples = self.mastery_progress()
+        progress_percent = (mastered_count / total_examples * 100) if total_examples > 0 else 0
+        if progress_percent >= 50 and not self.shown_50:
+            self.shown_50 = True
+            triggers += (TRIGGER_HALF,)
+        return triggers
+
+    def mastery_progress(self):
+        """Возвращает (изучено, всего) для первого этапа"""
+        return self.mastery.mastered_count, len(self.mastery)
+
+    # --- Переходы между этапами --- #
+
+    def start_marathon(self):
+        """Переход ко второму этапу после изучения таблицы"""
+        self.current_stage = 2
+        self.current_score = 0
+        self.pending = None
+        self.drop_marathon_sampler()
+
+    def fact_weight(self, fact):
+        """Вес примера во втором этапе по его статистике"""
+        stats = self.stats
+        if not stats.attempts[fact]:
+            return WEIGHT_UNSEEN
+        slowness = min(stats.latency_ewma[fact] / self.time_limit, 1.0)
+        return WEIGHT_BASE + WEIGHT_ERROR * stats.error_rate(fact) + WEIGHT_SLOW * slowness
+
+    def marathon_sampler(self):
+        """Таблица выбора по примерам до текущей таблицы.
+
+        Вес примера обновляется при каждом ответе на него, а таблица
+        пересобирается пачкой раз в MARATHON_REBUILD_EVERY ответов: выбор
+        остается O(1), а пересборка за O(n) делится на много вопросов.
+        """
+        end = self.index.prefix_end(self.current_learning_table)
+        self.stats.grow(end)
+        if self.marathon_weights is None or len(self.marathon_weights) != end:
+            self.marathon_weights = [self.fact_weight(fact) for fact in range(end)]
+            self._marathon_sampler = None
+        if self._marathon_sampler is None or self.marathon_changes >= MARATHON_REBUILD_EVERY:
+            self._marathon_sampler = AliasTable(self.marathon_weights)
+            self.marathon_changes = 0
+        return self._marathon_sampler
+
+    def drop_marathon_sampler(self):
+        self.marathon_weights = None
+        self._marathon_sampler = None
+        self.marathon_changes = 0
+
+    def complete_table(self):
+        """Переход к следующей таблице после марафона.
+
+        Возвращает False, если пройдена последняя таблица.
+        """
+        self.pending = None
+        self.mastery = MasteryTracker(correct_needed=CORRECT_NEEDED)
+        self.scheduler = self.scheduler_factory()
+        next_table = self.index.next_table(self.current_learning_table)
+        if next_table is not None:
+            self.current_learning_table = next_table
+            self.current_stage = 1  # Reset to stage 1 for new table
+            self.current_score = 0
+            return True
+        return False
+
+    # --- Снимок состояния --- #
+
+    def snapshot(self, include_stats=True):
+        """Полное состояние движка в виде словаря, пригодного для JSON.
+
+        Без include_stats статистика не кодируется (ее хранят отдельно).
+        """
+        data = {
+            'problem_space': self.index.name,
+            'current_learning_table': self.current_learning_table,
+            'time_limit': self.time_limit,
+            'current_score': self.current_score,
+            'current_stage': self.current_stage,
+            'mastery_facts': list(self.mastery.facts),
+            'mastery_start': self.mastery.start,
+            'consecutive_correct': list(self.mastery.counts),
+            'scheduler': self.scheduler.snapshot(),
+            'current_fact': self.current_fact,
+            'session_active': self.session_active,
+            'correct_streak': self.correct_streak,
+            'fast_answers': self.fast_answers,
+            'session_correct': self.session_correct,
+            'shown_50': self.shown_50,
+        }
+        if include_stats:
+            data['fact_stats'] = self.stats.snapshot()
+        return data
+
+    def restore(self, data):
+        """Восстанавливает состояние из snapshot() (недостающие ключи - по умолчанию).
+
+        Прогресс другого набора таблиц не подходит к номерам примеров этого
+        индекса, поэтому из него берется только настройка таймера.
+        """
+        self.reset()
+        self.stats = FactStats()
+        self.time_limit = data.get('time_limit', DEFAULT_TIME_LIMIT)
+        if data.get('problem_space', 'classic') != self.index.name:
+            return
+        self.current_learning_table = data.get('current_learning_table', self.index.first_table)
+        self.current_score = data.get('current_score', 0)
+        self.current_stage = data.get('current_stage', 1)
+        self.mastery = MasteryTracker(data.get('mastery_start', 0), data.get('mastery_facts', []),
+                                      CORRECT_NEEDED, data.get('consecutive_correct'))
+        self.scheduler = scheduler_from_snapshot(data.get('scheduler'))
+        if self.scheduler is None:
+            self.scheduler = self.scheduler_factory(self.mastery.unmastered)
+        self.current_fact = data.get('current_fact')
+        self.session_active = data.get('session_active', False)
+        self.correct_streak = data.get('correct_streak', 0)
+        self.fast_answers = data.get('fast_answers', 0)
+        self.session_correct = data.get('session_correct', 0)
+        self.shown_50 = data.get('shown_50', False)
+        self.stats.restore(data.get('fact_stats'))
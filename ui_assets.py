@@ -0,0 +1,48 @@
+"""Изображения интерфейса из атласа ui.atlas.
+
+Все изображения экрана собраны tools/pack_atlas.py в одну текстуру
+ui-0.png; ui.atlas описывает области в ней. preload() при старте
+загружает атлас один раз, дальше виджеты получают области по имени
+(texture('star_filled')) - без проверок файлов и поиска загрузчика, и все
+звезды рисуются одной текстурой.
+"""
+import os
+
+from applog import get_logger
+
+log = get_logger('assets')
+
+ATLAS_FILE = 'ui.atlas'
+
+
+class UiAssets:
+    """Области атласа интерфейса по именам"""
+
+    def __init__(self, atlas_path=None):
+        if atlas_path is None:
+            atlas_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ATLAS_FILE)
+        self.atlas_path = atlas_path
+        self.textures = {}
+        self.loaded = False
+
+    def preload(self):
+        """Загружает атлас (один раз); False, если его нет или он поврежден"""
+        if self.loaded:
+            return bool(self.textures)
+        self.loaded = True
+        from kivy.atlas import Atlas
+        try:
+            self.textures = dict(Atlas(self.atlas_path).textures)
+        except Exception as e:
+            log.error('Ошибка загрузки атласа %s: %s', self.atlas_path, e)
+            return False
+        log.info('Атлас %s: областей %s', self.atlas_path, len(self.textures))
+        return True
+
+    def texture(self, name):
+        """Область атласа или None (атлас не загружен или области нет)"""
+        return self.textures.get(name)
+
+
+# Атлас приложения (загружается в LearningApp.build)
+UI_ASSETS = UiAssets()